@@ -1,7 +1,10 @@
+import re
+import warnings
 from pathlib import Path
 
 import matplotlib.lines as mlines
 import matplotlib.pyplot as plt
+import matplotlib.transforms as mtransforms
 import pandas as pd
 
 TECHNOLOGIES = ["reference"]  # e.g. ["uwb", "ble", ...] or "reference" for reference location
@@ -23,14 +26,24 @@ TECH_COLUMN_HINTS = {
     "gnss": ["GNSS"],
 }
 
+# Label boxes shared by all point/anchor labels
+POINT_LABEL_BBOX = {"boxstyle": "round,pad=0.1", "fc": "white", "ec": "none", "alpha": 0.65}
+ANCHOR_LABEL_BBOX = {"boxstyle": "round,pad=0.15", "fc": "white", "ec": "none", "alpha": 0.75}
+
+# Point labels are skipped (with a warning) if more points than this would be labeled; None = always label
+MAX_POINT_LABELS = None
+
+# Precomputed lookups: technology -> color (first occurrence wins), technology -> compiled hint alternation
+_TECH_COLOR = {t: f"C{i}" for i, t in reversed(list(enumerate(TECHNOLOGIES or [])))}
+_TECH_HINT_PATTERNS = {t: re.compile("|".join(map(re.escape, hints))) for t, hints in TECH_COLUMN_HINTS.items()}
+_XY_LOCAL_PATTERN = re.compile(r"^(?P<axis>[XYZ])_LOCAL(?:_(?P<tag>.+))?$")
+
+
 def _color_for(technology: str, default: str = "k") -> str:
     """Stable per-technology colors using Matplotlib's default prop cycle."""
     if not technology:
         return default
-    tech = technology.lower()
-    if tech in (TECHNOLOGIES or []):
-        return f"C{(TECHNOLOGIES or []).index(tech)}"
-    return default
+    return _TECH_COLOR.get(technology.lower(), default)
 
 
 def _anchor_technology_from_point_id(point_id: str) -> str | None:
@@ -64,92 +77,115 @@ POINT_PATH = BASE / "data" / "reference" / "pickle" / "point_coordinates.pkl"
 def _filter_technology(df: pd.DataFrame) -> pd.DataFrame:
     if TECHNOLOGIES is None or "technology" not in df.columns:
         return df
-    return df[df["technology"].isin(TECHNOLOGIES)].copy()
+    return df[df["technology"].isin(TECHNOLOGIES)]
 
 
 def _filter_crs(df: pd.DataFrame, in_crs: str) -> pd.DataFrame:
-    cols = CRS.get(in_crs)
+    pattern = re.compile("|".join(map(re.escape, CRS.get(in_crs))))
     # return all columns which have CRS[in_crs] in header, but also get something like X_LOCAL_CENTER
-    filtered_cols = [col for col in df.columns if any(c in col for c in cols)]
+    filtered_cols = list(df.columns[df.columns.str.contains(pattern)])
     # keep technology for later filtering (if present)
     if "technology" in df.columns:
         filtered_cols = ["technology"] + filtered_cols
     # keep point_id for labeling
     if "point_id" in df.columns and "point_id" not in filtered_cols:
         filtered_cols = ["point_id"] + filtered_cols
-    return df[filtered_cols].copy()
+    return df[filtered_cols]
 
 
-def _get_xy(df: pd.DataFrame):
-    candidates = [
-        ("X_LOCAL", "Y_LOCAL"),
-    ]
-    for x_col, y_col in candidates:
-        # if column names have candidates in header, but use anything like X_LOCAL_CENTER, Y_LOCAL_CENTER
-        x_candidates = [col for col in df.columns if x_col in col]
-        y_candidates = [col for col in df.columns if y_col in col]
-        if x_candidates and y_candidates:
-            # pick the first match for each to return 1D series
-            return df[x_candidates[0]], df[y_candidates[0]], (x_candidates[0], y_candidates[0])
+def _build_xy_index(df: pd.DataFrame) -> dict[str, tuple[str, str]]:
+    """Map each LOCAL column tag to its (x_col, y_col) pair in a single pass over the columns.
 
+    The tag is the part after the axis prefix, e.g. "" for X_LOCAL, "CENTER" for X_LOCAL_CENTER and "UWB1" for
+    X_LOCAL_UWB1. Entries keep the column order of `df`.
+    """
+    x_cols: dict[str, str] = {}
+    y_cols: dict[str, str] = {}
+    for col in df.columns:
+        m = _XY_LOCAL_PATTERN.match(str(col))
+        if m is None:
+            continue
+        tag = m["tag"] or ""
+        if m["axis"] == "X":
+            x_cols.setdefault(tag, col)
+        elif m["axis"] == "Y":
+            y_cols.setdefault(tag, col)
+    return {tag: (x_col, y_cols[tag]) for tag, x_col in x_cols.items() if tag in y_cols}
+
+
+def _get_xy(df: pd.DataFrame, xy_index: dict[str, tuple[str, str]] | None = None):
+    if xy_index is None:
+        xy_index = _build_xy_index(df)
+    if not xy_index:
+        return None
+    # use the first pair, e.g. X_LOCAL/Y_LOCAL or X_LOCAL_CENTER/Y_LOCAL_CENTER, to return 1D series
+    x_col, y_col = next(iter(xy_index.values()))
+    return df[x_col], df[y_col], (x_col, y_col)
 
-def _get_xy_for_technology(points_df: pd.DataFrame, technology: str):
+
+def _get_xy_for_technology(points_df: pd.DataFrame, technology: str,
+                           xy_index: dict[str, tuple[str, str]] | None = None):
     """Extract X/Y series from the wide points dataframe for a specific technology.
 
     Expected patterns include:
       - X_LOCAL_<TECH>, Y_LOCAL_<TECH>
       - X_LOCAL_<TECH><suffix> (e.g., UWB1/UWB2)
-    """
-    hints = TECH_COLUMN_HINTS.get(technology.lower(), [technology.upper()])
 
-    # Look for X/Y columns that contain both axis prefix and any hint.
-    x_cols = [c for c in points_df.columns if "X_LOCAL" in c and any(h in c.upper() for h in hints)]
-    y_cols = [c for c in points_df.columns if "Y_LOCAL" in c and any(h in c.upper() for h in hints)]
+    Pass a precomputed `_build_xy_index(points_df)` as `xy_index` to avoid rescanning the columns.
+    """
+    if xy_index is None:
+        xy_index = _build_xy_index(points_df)
+    pattern = _TECH_HINT_PATTERNS.get(technology.lower()) or re.compile(re.escape(technology.upper()))
 
-    if not x_cols or not y_cols:
+    # Tags that contain any hint; with multiple matches (e.g., UWB1/UWB2), take the first in sorted order.
+    tags = sorted(tag for tag in xy_index if pattern.search(tag.upper()))
+    if not tags:
         return None
 
-    # Keep order stable and pair with common suffix where possible
-    x_cols = sorted(x_cols)
-    y_cols = sorted(y_cols)
+    x_col, y_col = xy_index[tags[0]]
+    return points_df[x_col], points_df[y_col], (x_col, y_col)
 
-    # If there are multiple matches (e.g., UWB1/UWB2), take the first pair.
-    return points_df[x_cols[0]], points_df[y_cols[0]], (x_cols[0], y_cols[0])
 
+def _annotate_points_once(ax: plt.Axes, points_df: pd.DataFrame, technology: str,
+                          max_labels: int | None = MAX_POINT_LABELS,
+                          xy_index: dict[str, tuple[str, str]] | None = None):
+    """Annotate each point_id exactly once based on the requested technology columns.
 
-def _annotate_points_once(ax: plt.Axes, points_df: pd.DataFrame, technology: str):
-    """Annotate each point_id exactly once based on the requested technology columns."""
+    Labels are skipped entirely, with a warning, if more than `max_labels` points would be labeled.
+    """
     if "point_id" not in points_df.columns:
         return
 
-    xy = _get_xy_for_technology(points_df, technology)
+    xy = _get_xy_for_technology(points_df, technology, xy_index)
     if xy is None:
         return
 
     x_s, y_s, _ = xy
+    valid = x_s.notna() & y_s.notna()
+    if max_labels is not None and valid.sum() > max_labels:
+        warnings.warn(f"Skipping {int(valid.sum())} point labels for {technology}: more than max_labels={max_labels}.",
+                      stacklevel=2)
+        return
+
+    # Offset in screen coords, computed once for all labels
+    offset = mtransforms.offset_copy(ax.transData, fig=ax.figure, x=6, y=-10, units="points")
 
     # points_df is wide with one row per point_id; annotate each row once
-    for pid, x, y in zip(points_df["point_id"].astype(str), x_s, y_s):
-        if pd.isna(x) or pd.isna(y):
-            continue
-        ax.annotate(
-            pid,
-            (x, y),
-            textcoords="offset points",
-            xytext=(6, -10),
-            ha="left",
-            va="top",
-            color="blue",
-            bbox=dict(boxstyle="round,pad=0.1", fc="white", ec="none", alpha=0.65),
-        )
-
-
-def main():
+    for pid, x, y in zip(points_df.loc[valid, "point_id"], x_s[valid], y_s[valid]):
+        ax.text(x, y, pid, transform=offset, ha="left", va="top", color="blue", bbox=POINT_LABEL_BBOX)
+
+
+def main(max_point_labels: int | None = MAX_POINT_LABELS):
     anchors_raw = pd.read_pickle(ANCHOR_PATH)
     points_raw = pd.read_pickle(POINT_PATH)
 
     anchors_raw = _filter_crs(anchors_raw, "LOCAL")
     points_raw = _filter_crs(points_raw, "LOCAL")
+    # Convert point ids to str once; they are reused for labels of every technology
+    if "point_id" in points_raw.columns:
+        points_raw = points_raw.assign(point_id=points_raw["point_id"].astype(str))
+    # Resolve the X/Y column pairs once; lookups per technology are then dict accesses
+    points_xy = _build_xy_index(points_raw)
 
     plt.figure(figsize=(12, 12))
     ax = plt.gca()
@@ -167,47 +203,39 @@ def main():
     labeled_shared_ids: set[str] = set()
 
     if "point_id" in anchors_raw.columns:
-        for _, row in anchors_raw.iterrows():
-            pid = row.get("point_id")
-            tech = _anchor_technology_from_point_id(pid)
-            c = _color_for(tech, default="k")
-
-            x = row[ax_cols[0]]
-            y = row[ax_cols[1]]
-
-            # plot each anchor to allow per-point color
-            ax.scatter(x, y, marker="^", s=70, c=c,
+        # Count how many anchors share each numeric suffix once, instead of rescanning all anchors per row
+        pid_str = anchors_raw["point_id"].astype(str)
+        suffixes = pid_str.str.rsplit("_", n=1).str[-1].where(pid_str.str.contains("_"))
+        suffix_counts = suffixes.value_counts().to_dict()
+
+        # One scatter call per technology color instead of one per anchor
+        techs = anchors_raw["point_id"].map(_anchor_technology_from_point_id)
+        for tech, grp in anchors_raw.groupby(techs, sort=False, dropna=False):
+            tech = tech if isinstance(tech, str) else None
+            ax.scatter(grp[ax_cols[0]], grp[ax_cols[1]], marker="^", s=70, c=_color_for(tech, default="k"),
                        label=f"Anchors ({tech})" if tech else "Anchors")
 
+        anchor_offset = mtransforms.offset_copy(ax.transData, fig=ax.figure, x=8, y=8, units="points")
+        for pid, x, y in zip(pid_str, anchors_raw[ax_cols[0]], anchors_raw[ax_cols[1]]):
             # Label policy:
             # - If multiple technologies share same numeric suffix, label only once as 'anchor_XX'
             # - If suffix can't be parsed, or it's a single-tech anchor, label with full point_id
-            shared_id = _shared_anchor_id_from_point_id(pid) if isinstance(pid, str) else None
+            shared_id = _shared_anchor_id_from_point_id(pid)
 
             label_text = None
             if shared_id is None:
-                label_text = str(pid)
+                label_text = pid
             else:
-                # Count how many anchors share this suffix
-                same_suffix = anchors_raw["point_id"].astype(str).str.endswith(f"_{shared_id}").sum()
-                if same_suffix > 1:
+                if suffix_counts.get(shared_id, 0) > 1:
                     if shared_id not in labeled_shared_ids:
                         labeled_shared_ids.add(shared_id)
                         label_text = f"Multi-Anchor_{shared_id}"
                 else:
-                    label_text = str(pid)
+                    label_text = pid
 
             if label_text:
                 # More consistent label placement: offset in screen coords + small white background
-                ax.annotate(
-                    label_text,
-                    (x, y),
-                    textcoords="offset points",
-                    xytext=(8, 8),
-                    ha="left",
-                    va="bottom",
-                    bbox=dict(boxstyle="round,pad=0.15", fc="white", ec="none", alpha=0.75),
-                )
+                ax.text(x, y, label_text, transform=anchor_offset, ha="left", va="bottom", bbox=ANCHOR_LABEL_BBOX)
     else:
         ax.scatter(ax_x, ax_y, marker="^", s=70, label="Anchors", c="k")
 
@@ -215,9 +243,9 @@ def main():
     for idx, t in enumerate(TECHNOLOGIES or []):
         if "technology" in points_raw.columns:
             points = points_raw[points_raw["technology"].eq(t)]
-            xy = _get_xy(points)
+            xy = _get_xy(points, points_xy)
         else:
-            xy = _get_xy_for_technology(points_raw, t)
+            xy = _get_xy_for_technology(points_raw, t, points_xy)
 
         if xy is None:
             continue
@@ -227,7 +255,7 @@ def main():
         ax.scatter(px_x, px_y, marker="o", s=50, label=f"Points ({t})", c=_color_for(t, default=f"C{idx}"))
 
         # annotate point names once per point
-        _annotate_points_once(ax, points_raw, t)
+        _annotate_points_once(ax, points_raw, t, max_labels=max_point_labels, xy_index=points_xy)
 
     # De-duplicate legend entries
     handles, labels = ax.get_legend_handles_labels()
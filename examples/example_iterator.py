@@ -1,6 +1,23 @@
+import ast
+import concurrent.futures
+import functools
+import json
+import math
+import re
+import warnings
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
-from typing import Iterator, Optional, Union, Dict, Any
+from typing import Iterator, Optional, Tuple, Union, Dict, Any
+
+try:
+    import numba  # type: ignore
+except ImportError:
+    # numba is optional; the NumPy implementation below is used instead
+    numba = None
 
 
 class Dataset:
@@ -15,8 +32,10 @@ class Dataset:
         csv/merged.csv
         parquet/merged.parquet
         pickle/merged.pkl
-        <backend>/wifi.* , ble.* , uwb.* , gnss.* , nr5g.*  (optional but supported for convenience)
-        Or: data for systems may also be found specifically under folder/pickle/<sys>.pkl as per preprocessing.
+        <backend>/wifi.* , ble.* , uwb.* , gnss.* , nr5g.*  (read with the same backend as merged)
+
+    Per-system reads can be restricted to a subset of columns via `system_columns`, e.g.
+    {"wifi": ["ts", "anchor_ids", "ranges"]}. For parquet the projection is pushed into the reader.
 
     Each item produced by iteration is a dict with keys:
       - 'ts': timestamp from merged
@@ -25,6 +44,7 @@ class Dataset:
           * pandas.Series for a single-row match
           * pandas.DataFrame for multiple rows match (if merged idx column holds list of indices)
           * None if there is no match for that system in this (ts, point_id)
+      Returned rows are not defensively copied; treat them as read-only and call `.copy()` before modifying.
     """
 
     SUPPORTED_BACKENDS = {"pickle", "csv", "parquet"}
@@ -35,11 +55,15 @@ class Dataset:
         systems: list[str] = ["wifi", "gnss", "ble", "uwb", "nr5g"],
         backend: str = "parquet",
         use_tqdm: bool = False,
+        system_columns: Optional[Dict[str, list[str]]] = None,
     ) -> None:
         self.folder = Path(folder)
         self.systems = list(systems)
         self.backend = backend.lower()
         self.use_tqdm = use_tqdm
+        self._needed_cols: Dict[str, Optional[list[str]]] = {
+            s: (list(system_columns[s]) if system_columns and s in system_columns else None) for s in self.systems
+        }
 
         if self.backend not in self.SUPPORTED_BACKENDS:
             raise ValueError(f"Unsupported backend '{backend}'. Choose from {sorted(self.SUPPORTED_BACKENDS)}")
@@ -54,13 +78,23 @@ class Dataset:
         if not self.merged_path.exists():
             raise FileNotFoundError(f"Merged file not found: {self.merged_path}")
 
-        # Load merged index into DataFrame
+        # Load merged index into DataFrame, restricted to the columns used for iteration
+        needed = ["ts", "point_id"] + [f"idx_{s}" for s in self.systems]
         if self.backend == "csv":
-            self.merged = pd.read_csv(self.merged_path)
+            needed_set = set(needed)
+            self.merged = pd.read_csv(self.merged_path, usecols=lambda c: c in needed_set, dtype_backend="pyarrow")
         elif self.backend == "parquet":
-            self.merged = pd.read_parquet(self.merged_path)
+            available = set(pq.read_schema(self.merged_path).names)
+            self.merged = pd.read_parquet(
+                self.merged_path, columns=[c for c in needed if c in available], dtype_backend="pyarrow"
+            )
         else:  # pickle
-            self.merged = pd.read_pickle(self.merged_path)
+            warnings.warn(
+                "The pickle backend cannot load a subset of columns; prefer backend='parquet' for faster loading.",
+                stacklevel=2,
+            )
+            merged = pd.read_pickle(self.merged_path)
+            self.merged = merged.drop(columns=[c for c in merged.columns if c not in needed])
 
         # Normalize column names and ensure index columns exist for requested systems
         # Expected columns: ts, point_id, idx_<system>
@@ -70,16 +104,24 @@ class Dataset:
                 # If missing, create with None to simplify access
                 self.merged[col] = None
 
-        # Lazy-loaded per-system full DataFrames (always read from pickle which is the canonical store per merge_data.py)
+        # Per-system DataFrames, read with the same backend as the merged file (loaded concurrently below)
         self._system_cache: Dict[str, Optional[pd.DataFrame]] = {s: None for s in self.systems}
+        # Resolved per-system DataFrames for all requested systems, filled on first access
+        self._resolved: Optional[Dict[str, pd.DataFrame]] = None
+
+        # Load all per-system files concurrently; pandas/pyarrow release the GIL for file I/O and decoding
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(self.systems))) as executor:
+            for s, df in zip(self.systems, executor.map(self._load_system_df, self.systems)):
+                self._system_cache[s] = df
+
+        # Split idx_<system> into a typed single-index array (-1 = no match) and a sparse map of multi-match rows
+        self._idx_single: Dict[str, np.ndarray] = {}
+        self._idx_multi: Dict[str, Dict[int, np.ndarray]] = {}
+        for s in self.systems:
+            self._idx_single[s], self._idx_multi[s] = _split_idx_column(self.merged[f"idx_{s}"])
 
     def _system_file_path(self, system: str) -> Path:
-        """Prefer canonical pickle path data/pickle/<system>.pkl. Fallback to current backend folder if present."""
-        # canonical
-        pkl = self.folder / "pickle" / f"{system}.pkl"
-        if pkl.exists():
-            return pkl
-        # fallback to backend-specific files named <system>.<ext>
+        """Return the backend-specific file path <backend>/<system>.<ext>."""
         if self.backend == "csv":
             path = self.folder / "csv" / f"{system}.csv"
         elif self.backend == "parquet":
@@ -97,12 +139,18 @@ class Dataset:
             # If not found, keep an empty DataFrame for graceful handling
             self._system_cache[system] = pd.DataFrame()
             return self._system_cache[system]
+        columns = self._needed_cols.get(system)
         if path.suffix == ".pkl" or path.suffix == ".pickle":
             df = pd.read_pickle(path)
+            if columns is not None:
+                df = df[columns]
         elif path.suffix == ".csv":
-            df = pd.read_csv(path)
+            df = _parse_csv_list_columns(pd.read_csv(path, usecols=columns))
         elif path.suffix == ".parquet":
-            df = pd.read_parquet(path)
+            # Columnar, multithreaded read from a memory-mapped file with column projection pushed into the reader
+            table = pq.ParquetFile(pa.memory_map(str(path), "r")).read(columns=columns, use_threads=True)
+            df = table.to_pandas(self_destruct=True)
+            del table
         else:
             raise ValueError(f"Unsupported file type for system '{system}': {path.suffix}")
         # Ensure a clean 0..N-1 index so the saved indices map correctly
@@ -110,33 +158,69 @@ class Dataset:
         self._system_cache[system] = df
         return df
 
+    def _resolve_system_dfs(self) -> Dict[str, pd.DataFrame]:
+        if self._resolved is None:
+            self._resolved = {s: self._in_access_order(s, self._load_system_df(s)) for s in self.systems}
+        return self._resolved
+
+    def _in_access_order(self, system: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Reorder `df` so that iterating the merged index reads its rows sequentially.
+
+        The idx arrays of `system` are remapped to the new row positions. The original index labels are kept,
+        so returned rows still carry their position in the system file as name/index.
+        """
+        n = len(df)
+        single = self._idx_single[system]
+        multi = self._idx_multi[system]
+        accessed = single[(single >= 0) & (single < n)]
+        if not multi and np.all(accessed[1:] >= accessed[:-1]):
+            # Already sequential (the usual case for ts-sorted files)
+            return df
+
+        # Sort rows by the merged position at which they are first accessed; unused rows go last
+        first_access = np.full(n, len(single), dtype=np.int64)
+        valid = (single >= 0) & (single < n)
+        np.minimum.at(first_access, single[valid], np.flatnonzero(valid))
+        for pos, idx in multi.items():
+            np.minimum.at(first_access, idx[(idx >= 0) & (idx < n)], pos)
+        perm = np.argsort(first_access, kind="stable")
+        remap = np.empty(n, dtype=np.int64)
+        remap[perm] = np.arange(n)
+
+        self._idx_single[system] = np.where(valid, remap[np.where(valid, single, 0)], -1)
+        self._idx_multi[system] = {pos: remap[idx[(idx >= 0) & (idx < n)]] for pos, idx in multi.items()}
+        return df.iloc[perm]
+
     def __len__(self) -> int:
         return len(self.merged)
 
-    def __getitem__(self, idx: int) -> Dict[str, Any]:
-        row = self.merged.iloc[idx]
-        item: Dict[str, Any] = {"ts": row.get("ts"), "point_id": row.get("point_id")}
+    def _make_item(self, dfs: Dict[str, pd.DataFrame], pos: int, ts: Any, point_id: Any) -> Dict[str, Any]:
+        """Build the per-item dictionary for row `pos` of the merged index."""
+        item: Dict[str, Any] = {"ts": ts, "point_id": point_id}
         for s in self.systems:
-            col = f"idx_{s}"
-            sys_idx = row.get(col)
-            df = self._load_system_df(s)
-            if df.empty or pd.isna(sys_idx):
-                item[s] = None
-            elif isinstance(sys_idx, list):
+            df = dfs[s]
+            i = self._idx_single[s][pos]
+            if 0 <= i < len(df):
+                # Single match: return a Series (single row)
+                item[s] = df.iloc[i]
+            elif pos in self._idx_multi[s] and not df.empty:
                 # Multiple matches: return a DataFrame slice
-                # Ensure indices are ints
-                indices = [int(i) for i in sys_idx]
-                item[s] = df.iloc[indices].copy()
+                item[s] = df.take(self._idx_multi[s][pos])
             else:
-                # Single match: return a Series (single row)
-                try:
-                    i = int(sys_idx)
-                    item[s] = df.iloc[i].copy()
-                except Exception:
-                    item[s] = None
+                item[s] = None
         return item
 
+    def __getitem__(self, idx: int) -> Dict[str, Any]:
+        pos = range(len(self))[idx]
+        row = self.merged.iloc[pos]
+        return self._make_item(self._resolve_system_dfs(), pos, row.get("ts"), row.get("point_id"))
+
     def __iter__(self) -> Iterator[Dict[str, Any]]:
+        # Pull the merged columns out as arrays once instead of building a row Series per step
+        ts = self.merged["ts"].to_numpy()
+        pids = self.merged["point_id"].to_numpy()
+        dfs = self._resolve_system_dfs()
+
         iterator = range(len(self))
         if self.use_tqdm:
             try:
@@ -146,7 +230,147 @@ class Dataset:
                 # If tqdm unavailable, silently fall back
                 pass
         for i in iterator:
-            yield self[i]
+            yield self._make_item(dfs, i, ts[i], pids[i])
+
+
+class _ReprLiterals(ast.NodeTransformer):
+    """Rewrite the non-literal parts of list reprs into constants ast.literal_eval accepts.
+
+    repr() writes non-finite floats as the bare names nan/inf and NumPy 2 scalars as e.g. np.float64(1.5).
+    """
+
+    _VALUES = {"nan": math.nan, "inf": math.inf}
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if node.id in self._VALUES:
+            return ast.copy_location(ast.Constant(self._VALUES[node.id]), node)
+        return node
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        func = node.func
+        if (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id in ("np", "numpy")
+                and len(node.args) == 1 and not node.keywords):
+            return self.visit(node.args[0])
+        return node
+
+
+_NP_SCALAR = re.compile(r"np\.\w+\(([^()]*)\)")
+_NON_FINITE = re.compile(r"\b(nan|inf)\b")
+
+
+def _parse_list_cell(text: str) -> list:
+    """Parse a list cell written by DataFrame.to_csv, e.g. "[1.5, nan]" or "['WIFI_01', 'WIFI_02']"."""
+    if "'" not in text and '"' not in text:
+        # Numeric lists are valid JSON once NumPy scalar wrappers and nan/inf are normalized, which parses far
+        # faster than walking the AST
+        normalized = _NON_FINITE.sub(lambda m: "NaN" if m.group(1) == "nan" else "Infinity", _NP_SCALAR.sub(r"\1", text))
+        try:
+            return json.loads(normalized)
+        except ValueError:
+            pass
+    return ast.literal_eval(_ReprLiterals().visit(ast.parse(text, mode="eval")))
+
+
+def _parse_csv_list_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Turn the list columns of a per-system csv file back into lists (csv stores them as their text repr).
+
+    Cells are parsed once per distinct text, so rows with identical cells share the same list object.
+    """
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        present = df[col].dropna()
+        if present.empty or not (isinstance(present.iloc[0], str) and present.iloc[0].startswith("[")):
+            continue
+        codes, uniques = pd.factorize(df[col])
+        parsed = [_parse_list_cell(text) for text in uniques]
+        df[col] = [parsed[code] if code >= 0 else None for code in codes]
+    return df
+
+
+def _split_idx_column(values: pd.Series) -> Tuple[np.ndarray, Dict[int, np.ndarray]]:
+    """Split an idx_<system> column into an int64 array (-1 = no single match) and a {row: indices} map."""
+    if isinstance(values.dtype, pd.ArrowDtype) and pa.types.is_list(values.dtype.pyarrow_dtype):
+        # Arrow list column: every non-null cell holds a list of indices
+        is_multi = values.notna().to_numpy(dtype=bool)
+        single = np.full(len(values), -1, dtype=np.int64)
+    else:
+        if pd.api.types.is_numeric_dtype(values.dtype):
+            is_multi = np.zeros(len(values), dtype=bool)
+            numeric = values
+        else:
+            # Object (pickle) or string (csv) cells: multi-matches are lists/arrays or their "[i, j]" text
+            values = values.astype(object)
+            is_multi = values.map(_is_multi_cell).to_numpy(dtype=bool)
+            numeric = pd.to_numeric(values.where(~is_multi), errors="coerce")
+        # Go through float so missing values become NaN (not a nullable NA) before casting to int
+        single_f = numeric.to_numpy(dtype=float, na_value=np.nan)
+        single = np.where(np.isnan(single_f), -1, single_f).astype(np.int64)
+    multi = {
+        int(pos): np.asarray(_parse_list_cell(v) if isinstance(v, str) else v, dtype=np.int64)
+        for pos, v in zip(np.flatnonzero(is_multi), values[is_multi])
+    }
+    return single, multi
+
+
+def _is_multi_cell(value: Any) -> bool:
+    """True for an idx cell holding several indices (list/array, or its text form in csv files)."""
+    return isinstance(value, (list, tuple, np.ndarray)) or (isinstance(value, str) and value.startswith("["))
+
+
+def _range_errors_numpy(axyz: np.ndarray, ref: np.ndarray, meas_r: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (true_range, |measured - true|) for anchor positions `axyz` (N x 3) seen from `ref`."""
+    true_r = np.sqrt(((axyz - ref) ** 2).sum(axis=1))
+    return true_r, np.abs(meas_r - true_r)
+
+
+if numba is not None:
+    @numba.njit(cache=True, fastmath=True)
+    def _range_errors(axyz, ref, meas_r):
+        n = axyz.shape[0]
+        true_r = np.empty(n)
+        err = np.empty(n)
+        for i in range(n):
+            dx = axyz[i, 0] - ref[0]
+            dy = axyz[i, 1] - ref[1]
+            dz = axyz[i, 2] - ref[2]
+            true_r[i] = math.sqrt(dx * dx + dy * dy + dz * dz)
+            err[i] = abs(meas_r[i] - true_r[i])
+        return true_r, err
+else:
+    _range_errors = _range_errors_numpy
+
+
+@functools.lru_cache(maxsize=1)
+def _load_refs() -> Tuple[pd.DataFrame, Dict[str, Tuple[pd.Index, np.ndarray]]]:
+    """Load the reference data once per process.
+
+    Returns the reference points indexed by point_id and the anchor positions grouped by technology prefix as
+    (anchor id index, N x 3 position array), e.g. {"WIFI": (Index(["WIFI_01", ...]), array([[x, y, z], ...])), ...}.
+    """
+    base = Path(__file__).resolve().parents[1]
+    ref_anchor_path = base / "data" / "reference" / "pickle" / "anchor_coordinates.pkl"
+    ref_point_path = base / "data" / "reference" / "pickle" / "point_coordinates.pkl"
+
+    anchors = pd.read_pickle(ref_anchor_path)
+    points = pd.read_pickle(ref_point_path)
+
+    # Index points by point_id for O(1) lookups; keep the first row for duplicate ids
+    points = points.set_index(points["point_id"].astype(str))
+    points = points[~points.index.duplicated(keep="first")]
+
+    # --- Anchor positions per technology (prefix of the anchor id, e.g. WIFI_01 -> WIFI)
+    if "point_id" not in anchors.columns:
+        raise KeyError(f"anchor_coordinates is missing required column 'point_id'")
+
+    anchor_ids = anchors["point_id"].astype(str)
+    techs = anchor_ids.str.split("_").str[0].str.upper().where(anchor_ids.str.contains("_"))
+    anchor_pos_by_tech: Dict[str, Tuple[pd.Index, np.ndarray]] = {}
+    for tech, grp in anchors.groupby(techs, sort=False):
+        ids = pd.Index(anchor_ids[grp.index])
+        unique = ~ids.duplicated(keep="first")
+        anchor_pos_by_tech[tech] = (ids[unique], grp[["X_LOCAL", "Y_LOCAL", "Z_LOCAL"]].to_numpy(dtype=float)[unique])
+    return points, anchor_pos_by_tech
 
 
 def example_calculate_wifi_ranging_error(measurement: Dict[str, Any]):
@@ -188,70 +412,51 @@ def example_calculate_wifi_ranging_error(measurement: Dict[str, Any]):
     else:
         raise NotImplementedError(f"Unsupported wifi object type: {type(wifi_obj)}")
 
-    base = Path(__file__).resolve().parents[1]
-    ref_anchor_path = base / "data" / "reference" / "pickle" / "anchor_coordinates.pkl"
-    ref_point_path = base / "data" / "reference" / "pickle" / "point_coordinates.pkl"
-
-    anchors = pd.read_pickle(ref_anchor_path)
-    points = pd.read_pickle(ref_point_path)
+    points, anchor_pos_by_tech = _load_refs()
+    anchor_index, anchor_xyz = anchor_pos_by_tech.get("WIFI", (pd.Index([]), np.empty((0, 3))))
 
     # --- Reference position of the WiFi device for this point_id
-    p = points.loc[points["point_id"].astype(str) == str(point_id)]
-    if p.empty:
+    if str(point_id) not in points.index:
         raise ValueError(f"No point found for point_id '{point_id}'")
 
     # Point reference for WiFi
     x_col, y_col, z_col = "X_LOCAL_WIFI", "Y_LOCAL_WIFI", "Z_LOCAL_WIFI"
 
-    p0 = p.iloc[0]
+    p0 = points.loc[str(point_id)]
     ref = pd.to_numeric(pd.Series([p0.get(x_col), p0.get(y_col), p0.get(z_col)]), errors="coerce").to_numpy(dtype=float)
     if pd.isna(ref).any():
         raise ValueError(f"Missing reference position for point_id '{point_id}'")
 
-    # --- Anchor positions (WiFi)
-    if "point_id" not in anchors.columns:
-        raise KeyError(f"anchor_coordinates is missing required column 'point_id'")
-
-    wifi_anchors = anchors[anchors["point_id"].astype(str).str.upper().str.startswith("WIFI_")].copy()
-    anchor_pos = {
-        str(r["point_id"]): pd.to_numeric(pd.Series([r["X_LOCAL"], r["Y_LOCAL"], r["Z_LOCAL"]]), errors="coerce").to_numpy(dtype=float)
-        for _, r in wifi_anchors.iterrows()
-    }
-
-    rows: list[dict[str, Any]] = []
-
-    # Each wifi row has `anchor_ids` and `ranges` lists
-    for _, wrow in wifi_df.iterrows():
-        anchor_ids = wrow.get("anchor_ids")
-        ranges = wrow.get("ranges")
-
-        if not isinstance(anchor_ids, list) or not isinstance(ranges, list):
-            continue
-
-        ts = wrow.get("ts", measurement.get("ts"))
-
-        for aid, meas_r in zip(anchor_ids, ranges):
-            axyz = anchor_pos.get(aid)
-            if axyz is None or (isinstance(meas_r, float) and pd.isna(meas_r)):
-                continue
-
-            true_r = float(((axyz - ref) ** 2).sum() ** 0.5)
-            meas_r_f = float(meas_r)
-            rows.append(
-                {
-                    "ts": ts,
-                    "point_id": point_id,
-                    "anchor_id": aid,
-                    "measured_range": meas_r_f,
-                    "true_range": true_r,
-                    "error": abs(meas_r_f - true_r),
-                }
-            )
-    return pd.DataFrame(rows)
+    # Each wifi row has `anchor_ids` and `ranges` lists; explode them into one row per (anchor, range) pair
+    pairs = wifi_df.reindex(columns=["ts", "anchor_ids", "ranges"])
+    if "ts" not in wifi_df.columns:
+        pairs["ts"] = measurement.get("ts")
+    is_seq = pairs["anchor_ids"].map(pd.api.types.is_list_like) & pairs["ranges"].map(pd.api.types.is_list_like)
+    pairs = pairs[is_seq].explode(["anchor_ids", "ranges"])
+    # Resolve all anchor ids to rows of the position array in one hashtable probe; unknown anchors are dropped
+    anchor_rows = anchor_index.get_indexer(pairs["anchor_ids"])
+    keep = (anchor_rows >= 0) & pairs["ranges"].notna().to_numpy()
+    pairs = pairs[keep]
+
+    # Compute all true ranges and errors in one pass (numba kernel if available, NumPy otherwise)
+    axyz = anchor_xyz[anchor_rows[keep]]
+    meas_r = pairs["ranges"].to_numpy(dtype=float)
+    true_r, err = _range_errors(axyz, ref, meas_r)
+
+    return pd.DataFrame(
+        {
+            "ts": pairs["ts"].to_numpy(),
+            "point_id": point_id,
+            "anchor_id": pairs["anchor_ids"].to_numpy(),
+            "measured_range": meas_r,
+            "true_range": true_r,
+            "error": err,
+        }
+    ).infer_objects()
 
 
 if __name__ == "__main__":
-    ds = Dataset(folder="data/processed/", systems=["wifi", "gnss", "ble", "uwb", "nr5g"], backend="pickle", use_tqdm=True)
+    ds = Dataset(folder="data/processed/", systems=["wifi", "gnss", "ble", "uwb", "nr5g"], backend="parquet", use_tqdm=True)
     print(f"Dataset length: {len(ds)}")
 
     for i, item in enumerate(ds):
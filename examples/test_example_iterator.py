@@ -0,0 +1,47 @@
+import pandas as pd
+
+from example_iterator import Dataset
+
+
+def _write_csv_dataset(folder):
+    csv_dir = folder / "csv"
+    csv_dir.mkdir()
+    pd.DataFrame(
+        {
+            "ts": [1000, 2000, 3000],
+            "point_id": ["A13B6", "A13B6", "A11B6"],
+            "idx_wifi": [0, [1, 2], None],
+        }
+    ).to_csv(csv_dir / "merged.csv", index=False)
+    pd.DataFrame(
+        {
+            "point_id": ["A13B6", "A13B6", "A13B6"],
+            "ts": [1000, 2000, 2000],
+            "anchor_ids": [["WIFI_01", "WIFI_02"]] * 3,
+            "ranges": [[1.5, float("nan")], [2.0, 3.0], [4.0, 5.0]],
+        }
+    ).to_csv(csv_dir / "wifi.csv", index=False)
+
+
+def test_csv_backend_resolves_multi_match_cells(tmp_path):
+    _write_csv_dataset(tmp_path)
+    ds = Dataset(folder=tmp_path, systems=["wifi"], backend="csv")
+
+    items = list(ds)
+
+    assert isinstance(items[0]["wifi"], pd.Series)
+    multi = items[1]["wifi"]
+    assert isinstance(multi, pd.DataFrame)
+    assert multi["ranges"].tolist() == [[2.0, 3.0], [4.0, 5.0]]
+    assert items[2]["wifi"] is None
+
+
+def test_csv_backend_parses_list_columns(tmp_path):
+    _write_csv_dataset(tmp_path)
+    ds = Dataset(folder=tmp_path, systems=["wifi"], backend="csv")
+
+    row = next(iter(ds))["wifi"]
+
+    assert row["anchor_ids"] == ["WIFI_01", "WIFI_02"]
+    assert row["ranges"][0] == 1.5
+    assert pd.isna(row["ranges"][1])
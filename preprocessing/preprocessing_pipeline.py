@@ -1,6 +1,7 @@
-import concurrent.futures
-import subprocess
+import asyncio
+import os
 import sys
+from typing import Optional, TextIO
 
 from preprocessing.src.merge_data import data_merge
 
@@ -13,50 +14,90 @@ preprocessing_modules = {
 }
 
 preprocessed_data_paths = {
-    'wifi': 'data/processed/pickle/wifi.pkl',
-    'ble': 'data/processed/pickle/ble.pkl',
-    'uwb': 'data/processed/pickle/uwb.pkl',
-    'gnss': 'data/processed/pickle/gnss.pkl',
-    'nr5g': 'data/processed/pickle/nr5g.pkl'
+    'wifi': 'data/processed/parquet/wifi.parquet',
+    'ble': 'data/processed/parquet/ble.parquet',
+    'uwb': 'data/processed/parquet/uwb.parquet',
+    'gnss': 'data/processed/parquet/gnss.parquet',
+    'nr5g': 'data/processed/parquet/nr5g.parquet'
 }
 
 
-def run_module(module_name: str) -> tuple[str, str, str, int]:
-    python_path = sys.executable
-    result = subprocess.run(
-        [python_path, "-m", module_name],
-        capture_output=True,
-        text=True,
-    )
-    return module_name, result.stdout, result.stderr, result.returncode
+# Lines of module output longer than this (asyncio's default is 64 KiB) are forwarded in chunks of this size
+STREAM_LINE_LIMIT = 2 ** 20
 
 
-def run_preprocessing_scripts(systems: list[str]) -> None:
+async def _forward_lines(stream: asyncio.StreamReader, prefix: str, target: TextIO) -> None:
+    def emit(data: bytes) -> None:
+        print(f"{prefix} {data.decode(errors='replace').rstrip()}", file=target, flush=True)
+
+    in_long_line = False
+    while True:
+        try:
+            line = await stream.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            # End of output; forward a last line without a trailing newline
+            if e.partial:
+                emit(e.partial)
+            return
+        except asyncio.LimitOverrunError as e:
+            # Line longer than the stream limit: forward the buffered part as a chunk and keep reading the line
+            emit(await stream.read(max(1, e.consumed)))
+            in_long_line = True
+            continue
+        if not (in_long_line and line == b"\n"):
+            emit(line)
+        in_long_line = False
+
+
+async def run_module(module_name: str, semaphore: asyncio.Semaphore) -> tuple[str, int]:
+    async with semaphore:
+        # -u: the child must not block-buffer its output, otherwise nothing arrives before it exits
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-u", "-m", module_name,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=STREAM_LINE_LIMIT,
+        )
+        # Forward output line by line as it arrives instead of buffering it until the module exits
+        prefix = f"[{module_name.rsplit('.', 1)[-1]}]"
+        await asyncio.gather(
+            _forward_lines(proc.stdout, prefix, sys.stdout),
+            _forward_lines(proc.stderr, prefix, sys.stderr),
+        )
+        returncode = await proc.wait()
+    return module_name, returncode
+
+
+async def _run_modules(module_names: list[str], max_workers: Optional[int] = None) -> None:
+    # Each child imports pandas & co., so don't start more interpreters than there are CPUs
+    if max_workers is None:
+        max_workers = min(len(module_names), os.cpu_count() or 1)
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+    tasks = [asyncio.create_task(run_module(module_name, semaphore)) for module_name in module_names]
+    for task in asyncio.as_completed(tasks):
+        module_name, rc = await task
+        if rc != 0:
+            print(f"Errors in {module_name} (exit code {rc}), see its output above.\n")
+        else:
+            print(f"{module_name} finished successfully.\n")
+
+
+def run_preprocessing_scripts(systems: list[str], max_workers: Optional[int] = None) -> None:
     """
-    Runs preprocessing scripts provided in the list concurrently.
+    Runs preprocessing scripts provided in the list concurrently as asyncio subprocesses.
+    Their output is forwarded line by line as it arrives, prefixed with the module name.
     Only scripts that exist in the `preprocessing_script_paths` are executed.
 
     :param scripts: List of scripts to be executed. Each script should correspond to
         an entry in the `preprocessing_script_paths` dictionary.
     :type scripts: list[str]
+    :param max_workers: Maximum number of scripts running at the same time. Defaults to
+        ``min(len(systems), os.cpu_count())``.
+    :type max_workers: Optional[int]
     :return: None
     """
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = [
-            executor.submit(run_module, preprocessing_modules[system])
-            for system in systems
-            if system in preprocessing_modules
-        ]
-        for future in concurrent.futures.as_completed(futures):
-            module_name, stdout, stderr, rc = future.result()
-            if rc != 0:
-                print(f"Errors in {module_name}:")
-                if stdout:
-                    print(stdout)
-                if stderr:
-                    print(stderr)
-            else:
-                print(f"{module_name} finished successfully.\n")
+    module_names = [preprocessing_modules[system] for system in systems if system in preprocessing_modules]
+    asyncio.run(_run_modules(module_names, max_workers))
 
 
 def run_preprocessing_pipeline() -> None:
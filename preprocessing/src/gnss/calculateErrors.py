@@ -5,12 +5,25 @@ Created on Mon Jan 13 16:50:10 2025
 @author: M.Ammad
 """
 
+import functools
+
 import numpy as np
 import georinex as gr
 import gnss_lib_py as glp
 import pandas as pd
 
+try:
+    import numba  # type: ignore
+except ImportError:
+    # numba is optional; the NumPy implementation of the Klobuchar model is used instead
+    numba = None
+
+# Working precision of the delay models. Pseudoranges are only resolved to the decimeter, so
+# single precision is plenty for the trig/polynomial chain; results are returned as float64.
+MODEL_DTYPE = np.float32
+
 
+@functools.lru_cache(maxsize=8)
 def get_iono_parameters(rinex_path: str):
     nav_file = gr.load(rinex_path)
     return nav_file.ionospheric_corr_GPS
@@ -35,15 +48,17 @@ def get_iono_parameters(rinex_path: str):
 # Original file: utils/gnss_models.py
 # License: MIT License
 def calculate_iono_delay(gps_millis, iono_params, rx_ecef,
-                          sv_pos, constellation="gps"):
+                          sv_pos, constellation="gps", *, gps_tow=None,
+                          rx_llh=None, el_az=None):
     """Calculate the ionospheric delay in pseudorange using the Klobuchar
     model Section 5.3.2 [1]_.
 
     Parameters
     ----------
-    gps_millis : int
+    gps_millis : int or np.ndarray
         Time at which measurements are needed, measured in milliseconds
-        since start of GPS epoch [ms].
+        since start of GPS epoch [ms]. Either a scalar or one value per
+        satellite.
     iono_params : np.ndarray
         Ionospheric atmospheric delay parameters for Klobuchar model,
         passed in 2x4 array, use None if not available.
@@ -58,6 +73,15 @@ def calculate_iono_delay(gps_millis, iono_params, rx_ecef,
         `gps_millis`, set to None if not available.
     constellation : string
         Constellation used for the ionospheric parameters addition.
+    gps_tow : float or np.ndarray
+        Precomputed GPS time of week for `gps_millis` [s], computed from
+        `gps_millis` if None.
+    rx_llh : np.ndarray
+        Precomputed 3x1 geodetic receiver position, computed from
+        `rx_ecef` if None.
+    el_az : np.ndarray
+        Precomputed 2xN elevation and azimuth of the satellites [deg],
+        computed from `rx_ecef` and `sv_pos` if None.
 
     Returns
     -------
@@ -77,26 +101,42 @@ def calculate_iono_delay(gps_millis, iono_params, rx_ecef,
         2nd Edition, Ganga-Jamuna Press, 2006.
 
     """
-    _, gps_tow = glp.gps_millis_to_tow(gps_millis)
+    if gps_tow is None:
+        _, gps_tow = glp.gps_millis_to_tow(gps_millis)
 
     #Reshape receiver position to 3x1
     rx_ecef = np.reshape(rx_ecef, [3,1])
 
-    # Determine the satellite locations
-    sv_pos = sv_pos.reshape(3, -1)
-    el_az = glp.ecef_to_el_az(rx_ecef, sv_pos)
+    # Determine the satellite locations, 3xN
+    if el_az is None:
+        sv_pos = np.asarray(sv_pos).reshape(3, -1)
+        el_az = glp.ecef_to_el_az(rx_ecef, sv_pos)
     el_r = np.deg2rad(el_az[0, :])
     az_r = np.deg2rad(el_az[1, :])
 
     # Calculate the WGS-84 latitude/longitude of the receiver
-    wgs_llh = glp.ecef_to_geodetic(rx_ecef)
+    wgs_llh = glp.ecef_to_geodetic(rx_ecef) if rx_llh is None else rx_llh
     lat_r = np.deg2rad(wgs_llh[0, :])
     lon_r = np.deg2rad(wgs_llh[1, :])
 
     # Parse the ionospheric parameters
-    alpha = iono_params[constellation][0,:]
-    beta = iono_params[constellation][1,:]
+    alpha = np.ascontiguousarray(iono_params[constellation][0,:], dtype=MODEL_DTYPE)
+    beta = np.ascontiguousarray(iono_params[constellation][1,:], dtype=MODEL_DTYPE)
+
+    el_r = np.ascontiguousarray(el_r, dtype=MODEL_DTYPE)
+    az_r = np.ascontiguousarray(az_r, dtype=MODEL_DTYPE)
+    gps_tow = np.ascontiguousarray(np.broadcast_to(np.asarray(gps_tow, dtype=MODEL_DTYPE), el_r.shape))
 
+    # Calculate the ionospheric delay (numba kernel if available, NumPy otherwise)
+    iono_delay = _klobuchar(el_r, az_r, alpha, beta, float(lat_r[0]), float(lon_r[0]), gps_tow)
+
+    # Convert ionospheric delay to equivalent meters
+    iono_delay = glp.consts.C*iono_delay.astype(np.float64)
+    return iono_delay
+
+
+def _klobuchar_numpy(el_r, az_r, alpha, beta, lat_r, lon_r, gps_tow):
+    """Klobuchar delay [s] for satellites at elevation `el_r` / azimuth `az_r` [rad]."""
     # Calculate the psi angle
     psi = 0.1356/(el_r+0.346) - 0.0691
 
@@ -104,9 +144,7 @@ def calculate_iono_delay(gps_millis, iono_params, rx_ecef,
     lat_i = lat_r + psi * np.cos(az_r)
 
     # Make sure values are in bounds
-    ind = np.argwhere(np.abs(lat_i) > 1.3090)
-    if len(ind) > 0:
-        lat_i[ind] = 1.3090 * np.sign(lat_i[ind])  # pragma: no cover
+    lat_i = np.clip(lat_i, -1.3090, 1.3090)
     # Calculate the ionospheric geodetic longitude
     lon_i = lon_r + psi * np.sin(az_r)/np.cos(lat_i)
 
@@ -122,9 +160,7 @@ def calculate_iono_delay(gps_millis, iono_params, rx_ecef,
     period = beta[0]+beta[1]*lat_m+beta[2]*lat_m**2+beta[3]*lat_m**3
 
     # Make sure values are in bounds
-    ind = np.argwhere(period < 72000).flatten()
-    if len(ind) > 0:
-        period[ind] = 72000  # pragma: no cover
+    period = np.maximum(period, 72000)
 
     # Calculate the local time angle
     theta = 2*np.pi*(solar_time - 50400) / period
@@ -133,25 +169,50 @@ def calculate_iono_delay(gps_millis, iono_params, rx_ecef,
     amp = (alpha[0]+alpha[1]*lat_m+alpha[2]*lat_m**2+alpha[3]*lat_m**3)
 
     # Make sure values are in bounds
-    ind = np.argwhere(amp < 0).flatten()
-    if len(ind) > 0:
-        amp[ind] = 0  # pragma: no cover
+    amp = np.maximum(amp, 0)
 
     # Calculate the slant factor
     slant_fact = 1.0 + 5.16e-1 * (1.6755-el_r)**3
 
     # Calculate the ionospheric delay
-    iono_delay = slant_fact * 5.0e-9
-    ind = np.argwhere(np.abs(theta) < np.pi/2.).flatten()
-    if len(ind) > 0:
-        iono_delay[ind] = slant_fact[ind]* \
-            (5e-9+amp[ind]*(1-theta[ind]**2/2.+theta[ind]**4/24.))
-
-    # Convert ionospheric delay to equivalent meters
-    iono_delay = glp.consts.C*iono_delay
-    return iono_delay
-
-def calculate_tropo_delay(gps_millis, rx_ecef, sv_pos):
+    return np.where(np.abs(theta) < np.pi/2.,
+                    slant_fact*(5e-9+amp*(1-theta**2/2.+theta**4/24.)),
+                    slant_fact*5.0e-9)
+
+
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _klobuchar(el_r, az_r, alpha, beta, lat_r, lon_r, gps_tow):
+        # Same model as _klobuchar_numpy, fused into one loop without temporaries
+        n = el_r.shape[0]
+        out = np.empty(n, dtype=el_r.dtype)
+        for i in numba.prange(n):
+            psi = 0.1356/(el_r[i]+0.346) - 0.0691
+            lat_i = lat_r + psi * np.cos(az_r[i])
+            if lat_i > 1.3090:
+                lat_i = 1.3090
+            elif lat_i < -1.3090:
+                lat_i = -1.3090
+            lon_i = lon_r + psi * np.sin(az_r[i])/np.cos(lat_i)
+            solar_time = (1.3751e4 * lon_i + gps_tow[i]) % 86400
+            lat_m = (lat_i + 2.02e-1 * np.cos(lon_i - 5.08))/np.pi
+            period = beta[0]+beta[1]*lat_m+beta[2]*lat_m**2+beta[3]*lat_m**3
+            if period < 72000:
+                period = 72000.0
+            theta = 2*np.pi*(solar_time - 50400) / period
+            amp = alpha[0]+alpha[1]*lat_m+alpha[2]*lat_m**2+alpha[3]*lat_m**3
+            if amp < 0:
+                amp = 0.0
+            slant_fact = 1.0 + 5.16e-1 * (1.6755-el_r[i])**3
+            if abs(theta) < np.pi/2.:
+                out[i] = slant_fact*(5e-9+amp*(1-theta**2/2.+theta**4/24.))
+            else:
+                out[i] = slant_fact*5.0e-9
+        return out
+else:
+    _klobuchar = _klobuchar_numpy
+
+def calculate_tropo_delay(gps_millis, rx_ecef, sv_pos, *, rx_llh=None, el_az=None):
     """Calculate tropospheric delay
     
     Parameters
@@ -161,8 +222,14 @@ def calculate_tropo_delay(gps_millis, rx_ecef, sv_pos):
         since start of GPS epoch [ms].
     rx_ecef : np.ndarray
         3x1 array of ECEF rx_pos position [m].
-    sv_pos : gnss_lib_py.navdata.navdata.NavData
-        Precomputed positions of satellites, set to None if not available.
+    sv_pos : np.ndarray
+        3xN array of precomputed satellite positions in ECEF [m].
+    rx_llh : np.ndarray
+        Precomputed 3x1 geodetic receiver position, computed from
+        `rx_ecef` if None.
+    el_az : np.ndarray
+        Precomputed 2xN elevation and azimuth of the satellites [deg],
+        computed from `rx_ecef` and `sv_pos` if None.
     
     Returns
     -------
@@ -179,21 +246,19 @@ def calculate_tropo_delay(gps_millis, rx_ecef, sv_pos):
     # Make sure that receiver position is 3x1
     rx_ecef = np.reshape(rx_ecef, [3,1])
 
-    # Reshape satellite positions to 3xN
-    sv_pos = sv_pos.reshape(3, 1)
-    
     # compute elevation and azimuth
-    el_az = glp.ecef_to_el_az(rx_ecef, sv_pos)
-    el_r  = np.deg2rad(el_az[0, :])
+    if el_az is None:
+        # Reshape satellite positions to 3xN
+        sv_pos = np.asarray(sv_pos).reshape(3, -1)
+        el_az = glp.ecef_to_el_az(rx_ecef, sv_pos)
+    el_r  = np.deg2rad(el_az[0, :]).astype(MODEL_DTYPE)
     
     # Calculate the WGS-84 latitude/longitude of the receiver
-    rx_lla = glp.ecef_to_geodetic(rx_ecef)
-    height = rx_lla[2, :]
+    rx_lla = glp.ecef_to_geodetic(rx_ecef) if rx_llh is None else rx_llh
+    height = rx_lla[2, :].astype(MODEL_DTYPE)
     
     # Force height to be positive
-    ind = np.argwhere(height < 0).flatten()
-    if len(ind) > 0:  # pragma: no cover
-        height[ind] = 0
+    height = np.maximum(height, 0)
     
     # Calculate the delay
     tr_delay_c1 = 2.47
@@ -204,11 +269,23 @@ def calculate_tropo_delay(gps_millis, rx_ecef, sv_pos):
     tropo_delay = tr_delay_c1/(np.sin(el_r)+tr_delay_c2) * np.exp(-height*tr_delay_c3)/C
 
     # Convert tropospheric delaly in equivalent meters
-    tropo_delay = C * tropo_delay
+    tropo_delay = C * tropo_delay.astype(np.float64)
     
     return tropo_delay
 
 
+@functools.lru_cache(maxsize=8)
+def load_nav_iono_params(rinex_nav_path: str) -> dict:
+    """Load the Klobuchar parameters from a RINEX navigation file.
+
+    Parsed once per path, repeated calls return the cached parameters.
+    """
+    rinex_nav = glp.RinexNav(rinex_nav_path)
+    if "gps" not in rinex_nav.iono_params.keys():
+        return rinex_nav.iono_params[list(rinex_nav.iono_params.keys())[0]]
+    return rinex_nav.iono_params
+
+
 def calculate_athmospheric_corrected_pseudorange(data: pd.DataFrame, rinex_nav_iono: str = 'RawData/LEIJ00DEU_R_20242970000_01D_MN.rnx',
                                                  ):
     """Calculate the ionospheric and tropospheric errors in the GNSS ephemeris.
@@ -225,27 +302,36 @@ def calculate_athmospheric_corrected_pseudorange(data: pd.DataFrame, rinex_nav_i
 
     """
 
-    rinex_nav = glp.RinexNav(rinex_nav_iono)
-    if "gps" not in rinex_nav.iono_params.keys():
-        iono_params = rinex_nav.iono_params[list(rinex_nav.iono_params.keys())[0]]
-    else:
-        iono_params = rinex_nav.iono_params
+    iono_params = load_nav_iono_params(rinex_nav_iono)
     rx_coord_global = np.array([51.5710, 13.0034, 0]).reshape(-1, 1)
     rx_ecef = glp.geodetic_to_ecef(rx_coord_global)
+    # The receiver is fixed, so its geodetic position is computed only once
+    rx_llh = glp.ecef_to_geodetic(rx_ecef)
     rx_ecef = rx_ecef.ravel()
-    # add column for corrected ranges with empty list
-    data['corr_pr_m'] = np.empty((len(data), 0)).tolist()
-    for idx, row in data.iterrows():
-        iono = np.array([calculate_iono_delay(row['gps_millis'], iono_params, rx_ecef, np.array(s))
-                         for s in zip(np.array(row['x_sv_m']),
-                                               np.array(row['y_sv_m']),
-                                               np.array(row['z_sv_m']))])
-        tropo = np.array([calculate_tropo_delay(row['gps_millis'], rx_ecef, np.array(s))
-                          for s in zip(np.array(row['x_sv_m']),
-                                       np.array(row['y_sv_m']),
-                                       np.array(row['z_sv_m']))])
-        corr_pr = np.reshape(np.array(row['raw_pr_m']), (-1, 1)) - iono - tropo
-        corr_pr = [x[0] for x in corr_pr]
-        data.at[idx, 'corr_pr_m'] = corr_pr
+    if data.empty:
+        data['corr_pr_m'] = pd.Series(dtype=object)
+        return data
+
+    # Stack the satellites of all epochs into one 3xM matrix and correct them in a single pass
+    n_sv = data['x_sv_m'].apply(len).to_numpy()
+    sv_pos = np.vstack([np.concatenate(data['x_sv_m'].to_numpy()),
+                        np.concatenate(data['y_sv_m'].to_numpy()),
+                        np.concatenate(data['z_sv_m'].to_numpy())]).astype(float)
+    gps_millis = np.repeat(data['gps_millis'].to_numpy(), n_sv)
+    raw_pr = np.concatenate(data['raw_pr_m'].to_numpy()).astype(float)
+
+    # Receiver/epoch dependent terms shared by both models: time of week once per
+    # unique epoch, elevation/azimuth once per satellite
+    epochs, epoch_of_row = np.unique(data['gps_millis'].to_numpy(), return_inverse=True)
+    _, epoch_tow = glp.gps_millis_to_tow(epochs)
+    gps_tow = np.repeat(np.atleast_1d(epoch_tow)[epoch_of_row], n_sv)
+    el_az = glp.ecef_to_el_az(rx_ecef.reshape(3, 1), sv_pos)
+
+    iono = calculate_iono_delay(gps_millis, iono_params, rx_ecef, sv_pos,
+                                gps_tow=gps_tow, rx_llh=rx_llh, el_az=el_az)
+    tropo = calculate_tropo_delay(gps_millis, rx_ecef, sv_pos, rx_llh=rx_llh, el_az=el_az)
+    corr_pr = raw_pr - iono - tropo
+
+    # scatter the flat result back to one list per epoch
+    data['corr_pr_m'] = [list(x) for x in np.split(corr_pr, np.cumsum(n_sv)[:-1])]
     return data
-
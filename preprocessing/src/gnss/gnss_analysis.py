@@ -48,5 +48,6 @@ def iono_free_lc(data: pd.DataFrame) -> pd.DataFrame:
 
 def filter_upper_l_band(df: pd.DataFrame) -> pd.DataFrame:
     """Filter df for upper L band frequencies"""
-    return df[df['signal_type'].apply(lambda x: upper_l_bank[x])]
+    # signal types outside upper_l_bank map to NaN and are dropped
+    return df[df['signal_type'].map(upper_l_bank).to_numpy(dtype=bool, na_value=False)]
 
@@ -4,16 +4,27 @@ Created on Tue Jan 14 13:35:18 2025
 
 @author: M.Ammad
 """
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union
+
+import numpy as np
 import pandas as pd
 
 
 
-def minimal_df(df: pd.DataFrame, system_name: str) -> pd.DataFrame:
+def minimal_df(df: Union[pd.DataFrame, str], system_name: str) -> pd.DataFrame:
     """Return minimal view with ts, point_id, system, and index in original df.
+    - Accepts either a DataFrame or the path to a system's parquet/pickle file. Parquet files are
+      read with column projection, so only ts and point_id are loaded.
     - Resets the index to ensure a clean 0..N-1 index per df used as sys_idx.
     - Adds a 'system' column with the system_name.
     """
-    df = df.reset_index(drop=True).copy()
+    if isinstance(df, str):
+        if df.endswith('.parquet'):
+            df = pd.read_parquet(df, columns=['ts', 'point_id'])
+        else:
+            df = pd.read_pickle(df)
+    df = df[['ts', 'point_id']].reset_index(drop=True)
     df['sys_idx'] = df.index
     df['system'] = system_name
     return df[['ts', 'point_id', 'system', 'sys_idx']]
@@ -32,8 +43,7 @@ def data_merge(systems: list, systems_paths: dict[str, str]) -> None:
     for sys in systems:
         if sys not in systems_paths:
             raise KeyError(f"System '{sys}' not found in systems_paths")
-        df = pd.read_pickle(systems_paths[sys])
-        minimals.append(minimal_df(df, sys))
+        minimals.append(minimal_df(systems_paths[sys], sys))
 
     # Determine target per-system column names based on requested systems
     idx_cols = [f"idx_{s}" for s in systems]
@@ -46,22 +56,22 @@ def data_merge(systems: list, systems_paths: dict[str, str]) -> None:
         cat = pd.concat(minimals, ignore_index=True)
 
         # Aggregate indices per system; turn singleton list into int, keep list otherwise
-        def agg_indices(g: pd.DataFrame):
-            vals = g['sys_idx'].tolist()
-            return int(vals[0]) if len(vals) == 1 else [int(v) for v in vals]
-
         grouped = (
-            cat.groupby(['ts', 'point_id', 'system'], as_index=False)
-               .apply(lambda g: pd.Series({'idx': agg_indices(g)}), include_groups=False)
+            cat.groupby(['ts', 'point_id', 'system'], sort=False, observed=True)['sys_idx']
+               .agg(list)
+               .reset_index()
         )
+        lens = grouped['sys_idx'].str.len().to_numpy()
+        vals = grouped['sys_idx'].to_numpy()
+        grouped['idx'] = pd.Series(np.where(lens == 1, [v[0] for v in vals], vals)).infer_objects()
 
         # Pivot to wide format: columns per system
-        pivoted = grouped.pivot_table(
-            index=['ts', 'point_id'],
-            columns='system',
-            values='idx',
-            aggfunc='first'
-        ).reset_index()
+        # (ts, point_id, system) is unique after the groupby, so no aggregation is needed
+        pivoted = (
+            grouped.pivot(index=['ts', 'point_id'], columns='system', values='idx')
+                   .reset_index()
+                   .rename_axis(columns=None)
+        )
 
         # Rename pivoted system columns to idx_<system>
         for s in systems:
@@ -81,23 +91,33 @@ def data_merge(systems: list, systems_paths: dict[str, str]) -> None:
 
     idx_cols = [f"idx_{s}" for s in systems]
     for col in idx_cols:
-        # Convert only non-NaN values to integers
-        export_df[col] = export_df[col].apply(
-            lambda x: f"{int(x)}" if pd.notna(x) and not isinstance(x, list) else x
-        )
-
-    export_df.to_csv(f"data/processed/csv/merged.csv", index=False)
-    merged_df.to_pickle(f"data/processed/pickle/merged.pkl")
-    merged_df.to_parquet(f"data/processed/parquet/merged.parquet")
+        # Convert only non-NaN scalar values to integers, lists are written as they are
+        is_scalar = export_df[col].notna() & ~export_df[col].map(type).eq(list)
+        if is_scalar.all():
+            export_df[col] = export_df[col].astype('Int64').astype(str)
+        elif is_scalar.any():
+            export_df[col] = export_df[col].astype(object)
+            export_df.loc[is_scalar, col] = export_df.loc[is_scalar, col].astype('Int64').astype(str)
+
+    # The three writers are IO bound and independent of each other, so run them concurrently
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [
+            executor.submit(export_df.to_csv, "data/processed/csv/merged.csv", index=False, lineterminator="\n"),
+            executor.submit(merged_df.to_pickle, "data/processed/pickle/merged.pkl"),
+            executor.submit(merged_df.to_parquet, "data/processed/parquet/merged.parquet",
+                            engine="pyarrow", compression="zstd"),
+        ]
+        for future in futures:
+            future.result()
 
 
 if __name__ == '__main__':
     systems_to_process = ['wifi', 'ble', 'uwb', 'gnss', 'nr5g']
     preprocessing_data_paths = {
-        'wifi': 'data/processed/pickle/wifi.pkl',
-        'ble': 'data/processed/pickle/ble.pkl',
-        'uwb': 'data/processed/pickle/uwb.pkl',
-        'gnss': 'data/processed/pickle/gnss.pkl',
-        'nr5g': 'data/processed/pickle/nr5g.pkl'
+        'wifi': 'data/processed/parquet/wifi.parquet',
+        'ble': 'data/processed/parquet/ble.parquet',
+        'uwb': 'data/processed/parquet/uwb.parquet',
+        'gnss': 'data/processed/parquet/gnss.parquet',
+        'nr5g': 'data/processed/parquet/nr5g.parquet'
     }
     data_merge(systems_to_process, preprocessing_data_paths)
@@ -8,8 +8,6 @@ Created on Mon Nov 25 15:18:34 2024
 
 import pandas as pd
 import os
-from datetime import datetime
-from datetime import timezone
 import re
 
 class ReadDataset:
@@ -24,16 +22,14 @@ class ReadDataset:
             for file in files if file.endswith('.csv')
         ]
 
+        parts = []
         for index, file5G in enumerate(files5G):
                             
             logData = pd.read_csv(file5G)
-            logData['TIME'] = logData.apply(
-                lambda row: datetime.fromisoformat(row['TIME'][:-1] + '+00:00').astimezone(timezone.utc), axis=1
-            )
-            logData['TIME'] = logData.apply(
-                lambda row: int(datetime.timestamp(row['TIME']) * 1000), axis=1
-            )
-            logData = logData[logData['IP Address'] == ip]
+            logData = logData[logData['IP Address'] == ip].copy()
+            # TIME is ISO 8601 in UTC with a trailing 'Z', convert to integer milliseconds since epoch
+            t = pd.to_datetime(logData['TIME'].str[:-1], utc=True, format='ISO8601')
+            logData['TIME'] = (t - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(milliseconds=1)
             logData.drop(['IP Address', 'RNTI'], inplace=True, axis=1)
             
             logData.rename(columns={'TIME': 'ts'}, inplace=True)
@@ -57,6 +53,8 @@ class ReadDataset:
                 logData['mess_id'] = len(logData) * [messID]
                 
 
-            self.df = pd.concat([self.df, logData])
+            parts.append(logData)
 
+        if parts:
+            self.df = pd.concat(parts, ignore_index=True)
         return self.df
\ No newline at end of file
@@ -7,21 +7,33 @@ Created on Mon Nov 25 15:30:42 2024
 
 import pandas as pd
 
+# Local time (CEST) is two hours ahead of the UTC timestamps
+LOCAL_OFFSET_MS = 2 * 60 * 60 * 1000
+
+
+def _to_millis(times: pd.Series):
+    """Naive datetimes as integer milliseconds since epoch"""
+    return times.to_numpy(dtype='datetime64[ms]').astype('int64')
+
+
 class DataProcessor:
     def __init__(self, df, messungTimePath='preprocessing/reference/pickle/time_reference.pkl'):
         self.df = df
         self.messungTime = pd.read_pickle(messungTimePath)
         
     def process_timestamps(self):
-        self.df['timestamp'] = pd.to_datetime(self.df['timestamp(ms)'].astype(float), unit='ms') + pd.Timedelta(hours=2)
+        # local time in integer milliseconds, compared against the window bounds converted to ms
+        self.df['timestamp'] = self.df['timestamp(ms)'].astype('int64') + LOCAL_OFFSET_MS
     
     def assign_measurement_ids(self):
+        mt = self.messungTime
+        windows = pd.IntervalIndex.from_arrays(_to_millis(mt['startTime']), _to_millis(mt['endTime']), closed='both')
+        pos = windows.get_indexer(self.df['timestamp'].values)
+        mask = pos >= 0
         self.df['mess_id'] = None
         self.df['Messung'] = None
-        for idx, row in self.messungTime.iterrows():
-            timestampRange = (self.df['timestamp'] >= row['startTime']) & (self.df['timestamp'] <= row['endTime'])
-            self.df.loc[timestampRange, 'mess_id'] = row['mess_id']
-            self.df.loc[timestampRange, 'Messung'] = idx + 1
+        self.df.loc[mask, 'mess_id'] = mt['mess_id'].values[pos[mask]]
+        self.df.loc[mask, 'Messung'] = mt.index.values[pos[mask]] + 1
 
     def clean_data(self):
         self.df.drop(columns=['timestamp'], inplace=True)
@@ -3,6 +3,13 @@ import json
 import os
 import numpy as np
 import pandas as pd
+
+try:
+    import orjson  # type: ignore
+except ImportError:
+    # orjson is optional; the standard library parser is used instead
+    orjson = None
+
 from preprocessing.src.utils import add_point_ground_truth, save_df
 
 # Constants
@@ -19,6 +26,9 @@ ANCHOR_IDS = {"1": "BLE_01",
 
 def load_json_logs(file_path):
     """Load and parse JSON logs from a file, filtering for entries with 'message'."""
+    if orjson is not None:
+        with open(file_path, "rb") as fh:
+            return [orjson.loads(line) for line in fh if b"message" in line]
     with open(file_path, "r") as fh:
         return [json.loads(line) for line in fh if "message" in line]
 
@@ -27,17 +37,21 @@ def create_dataframe_from_logs(logs):
     if len(logs) <= 2:
         return None
 
-    temp_df = pd.DataFrame()
-    temp_df["ts"] = [int(row["time"] * TIMESTAMP_MULTIPLIER) for row in logs]
-    temp_df["ts_pc"] = [[int(x * TIMESTAMP_MULTIPLIER) for x in row["timestamp_pc"]] for row in logs]
-    temp_df["anchor_ids"] = [["BLE1", "BLE2", "BLE3", "BLE4", "BLE5"] for row in logs]
-    temp_df["tag_ids"] = [row["tag_id"] for row in logs]
-    temp_df["ranges"] = [row["ranges"] for row in logs]
+    raw = pd.json_normalize(logs, max_level=0)
 
-    # Replace invalid ranges (0.0) with NaN
-    temp_df["ranges"] = temp_df["ranges"].apply(
-        lambda arr: [r if r != INVALID_RANGE_VALUE else np.nan for r in arr]
-    )
+    temp_df = pd.DataFrame()
+    temp_df["ts"] = (raw["time"].to_numpy(dtype=float) * TIMESTAMP_MULTIPLIER).astype("int64")
+    temp_df["ts_pc"] = [(np.asarray(x, dtype=float) * TIMESTAMP_MULTIPLIER).astype("int64").tolist()
+                        for x in raw["timestamp_pc"]]
+    temp_df["anchor_ids"] = [["BLE1", "BLE2", "BLE3", "BLE4", "BLE5"] for _ in range(len(raw))]
+    temp_df["tag_ids"] = raw["tag_id"].to_numpy()
+
+    # Replace invalid ranges (0.0) with NaN in one pass over all readings,
+    # then split them back into one list per reading
+    lengths = raw["ranges"].map(len).to_numpy()
+    ranges = np.concatenate([np.asarray(r, dtype=float) for r in raw["ranges"]])
+    ranges[ranges == INVALID_RANGE_VALUE] = np.nan
+    temp_df["ranges"] = [r.tolist() for r in np.split(ranges, np.cumsum(lengths)[:-1])]
 
     return temp_df
 
@@ -67,16 +81,17 @@ def preprocess_ble(input_dir: str = 'data/raw/ble/', output_dir: str = 'data/')
         output_dir: Directory where processed data will be saved
 
     """
-    df = pd.DataFrame()
+    parts = []
 
     # Recursively find and process all JSON files in input_dir
     pattern = os.path.join(input_dir, '**', '*.json')
-    for file in glob.glob(pattern, recursive=True):
+    for file in glob.iglob(pattern, recursive=True):
         logs = load_json_logs(file)
         temp_df = create_dataframe_from_logs(logs)
         if temp_df is not None:
-            df = pd.concat([df, temp_df])
+            parts.append(temp_df)
 
+    df = pd.concat(parts) if parts else pd.DataFrame()
     df.reset_index(drop=True, inplace=True)
     df = filter_and_clean_dataframe(df)
 
@@ -11,17 +11,26 @@ import gnss_lib_py as glp
 import pandas as pd
 import os
 import numpy as np
+from typing import Optional
 from preprocessing.src.gnss.calculateErrors import calculate_athmospheric_corrected_pseudorange
 from preprocessing.src.gnss.GNSS_Formatting import reformat_final
-from preprocessing.src.utils import save_df
+from preprocessing.src.utils import load_reference, lookup_point_ids, save_df
 
 
-def load_rinex(file: str) -> glp.RinexObs:
+def rinex_cache_path(rinex_file: str) -> str:
+    """
+    Location of the pickled parse result of a RINEX observation file: <dir>/.cache/<file name>.pkl.
+    """
+    return os.path.join(os.path.dirname(rinex_file), '.cache', os.path.basename(rinex_file) + '.pkl')
+
+
+def load_rinex(file: str, cache_file: Optional[str] = None) -> glp.RinexObs:
     """
     Loads a RINEX observation file using gnss_lib_py.
 
     Parameters:
-    file (str): Path to the RINEX observation file.
+    file (str): Path to the RINEX observation file, or to a pickled RinexObs (.pkl).
+    cache_file (str, optional): Where a freshly parsed RINEX file is pickled for later runs. None disables caching.
 
     Returns:
     glp.RinexObs: Loaded RINEX observation data.
@@ -34,10 +43,39 @@ def load_rinex(file: str) -> glp.RinexObs:
         print("RINEX data loaded successfully from pickle file.")
     else:
         rinex_obs = glp.RinexObs(file)
-        pickle.dump(rinex_obs, open('preprocessing/raw/gnss/preprocessed_rinex.pkl', 'wb'))
-        print("RINEX data loaded successfully and saved to preprocessed_rinex.pkl")
+        if cache_file is not None:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            with open(cache_file, 'wb') as f:
+                pickle.dump(rinex_obs, f, protocol=5)
+            print(f"RINEX data loaded successfully and saved to {cache_file}")
+        else:
+            print("RINEX data loaded successfully.")
     return rinex_obs
 
+# Offset between the GPS epoch (1980-01-06) and the unix epoch [ms]
+GPS_TO_UNIX_MS = (glp.GPS_EPOCH_0 - glp.UNIX_EPOCH_0).total_seconds() * 1000
+# Leap second introduction times in milliseconds since the GPS epoch, ascending
+_LEAPSECONDS_GPS_MS = np.sort([(t - glp.GPS_EPOCH_0).total_seconds() * 1000 for t in glp.LEAPSECONDS_TABLE])
+
+
+def gps_millis_to_unix_millis(gps_millis: np.ndarray) -> np.ndarray:
+    """
+    Converts milliseconds since the GPS epoch to UTC milliseconds since the unix epoch.
+
+    Vectorized equivalent of ``glp.gps_millis_to_datetime(gps_millis).timestamp() * 1000``,
+    using the leap seconds from ``glp.LEAPSECONDS_TABLE``.
+
+    Parameters:
+    gps_millis (np.ndarray): Milliseconds since the GPS epoch.
+
+    Returns:
+    np.ndarray: Milliseconds since the unix epoch (UTC).
+    """
+    gps_millis = np.asarray(gps_millis, dtype=float)
+    leap_seconds = np.searchsorted(_LEAPSECONDS_GPS_MS, gps_millis, side='right') - 1
+    return gps_millis + GPS_TO_UNIX_MS - leap_seconds * 1000.0
+
+
 def read_data(rinex_obs: glp.RinexObs, dump_file_dir: str) -> pd.DataFrame:
     """
     Reads GNSS data from a RINEX file and adds satellite states.
@@ -54,34 +92,20 @@ def read_data(rinex_obs: glp.RinexObs, dump_file_dir: str) -> pd.DataFrame:
 
     data = glp.add_sv_states(data, download_directory="data/raw/gnss/ephemeris/")
     data = data.pandas_df()
-    data.loc[:, 'ts'] = data.apply(lambda row:
-                                                     (glp.gps_millis_to_datetime(
-                                                         row['gps_millis']).timestamp()) * 1000,
-                                                     axis=1)
+    data.loc[:, 'ts'] = gps_millis_to_unix_millis(data['gps_millis'].to_numpy())
     data.to_csv(os.path.join(dump_file_dir, 'all_raw.csv'), index=False)
     return data
 
 
 def get_point_ids(data: pd.DataFrame) -> pd.DataFrame:
 
-    time_reference = pd.read_pickle('data/reference/pickle/time_reference.pkl')
-
-    # Create a temporary timestamp datetime column to filter the dataset
-    data['timestamp_temp'] = pd.to_datetime(data['ts'].astype(float),
-                                                    unit='ms')
-
-    # Initialize mess_id column with None
-    data['point_id'] = None
-
-    # Assign mess_id based on the time range in time_reference
-    for idx, row in time_reference.iterrows():
-        # Assign mess_id to rows in trajData where timestamp is within the range
-        timestampRange = (data['timestamp_temp'] >= row['start_time_UTC']) & (data['timestamp_temp'] <= row['end_time_UTC'])
-        data.loc[timestampRange, 'point_id'] = row['point']
+    time_reference = load_reference('time_reference')
 
+    # Look up the time window containing each timestamp in a single as-of join,
+    # rows outside every window keep None and are dropped below
+    data['point_id'] = lookup_point_ids(pd.to_datetime(data['ts'].astype(float), unit='ms'),
+                                        time_reference, 'start_time_UTC', 'end_time_UTC')
 
-    # Drop the temporary timestamp datetime column
-    data = data.drop(columns=['timestamp_temp'])
     data.dropna(inplace = True)
     data.reset_index(drop = True, inplace = True)
     return data
@@ -102,12 +126,12 @@ def get_ground_truth(data: pd.DataFrame) -> pd.DataFrame:
     pd.DataFrame: Merged DataFrame with ground truth data.
     """
 
-    groundTruth = pd.read_pickle('data/reference/pickle/point_coordinates.pkl')
+    groundTruth = load_reference('point_coordinates')
     groundTruth = groundTruth[['point_id', 'X_ECEF_GNSS', 'Y_ECEF_GNSS', 'Z_ECEF_GNSS', 'X_LOCAL_GNSS', 'Y_LOCAL_GNSS', 'Z_LOCAL_GNSS']]
 
 
-    data = data.merge(groundTruth, on ='point_id', how ='outer')
-    data = data.sort_values(by ='ts')
+    data = data.merge(groundTruth, on ='point_id', how ='left')
+    data = data.sort_values(by ='ts', kind ='stable')
     return data
 
 def generate_final_output(data: pd.DataFrame, nav_iono: str, output_dir: str) -> None:
@@ -140,9 +164,15 @@ def generate_final_output(data: pd.DataFrame, nav_iono: str, output_dir: str) ->
 
     # Convert all columns to native Python types
     for col in data.columns:
-        # if elements are lists, check the type of their elements. If np.str_ convert to str
-        if data[col].dtype == 'object':
-            data[col] = data[col].apply(lambda x: [str(i) if isinstance(i, np.str_) else i for i in x] if isinstance(x, list) else x)
+        if data[col].dtype != 'object':
+            continue
+        values = data[col].to_numpy()
+        # Element types are uniform within a column, so the first non-empty list tells whether
+        # the column holds np.str_ elements that need converting to str
+        sample = next((x for x in values if isinstance(x, list) and x), None)
+        if sample is None or not isinstance(sample[0], np.str_):
+            continue
+        data[col] = [[str(i) for i in x] if isinstance(x, list) else x for x in values]
 
     save_df(data, "gnss")
 
@@ -151,7 +181,7 @@ def generate_final_output(data: pd.DataFrame, nav_iono: str, output_dir: str) ->
 def preprocess_gnss(raw_dir: str = 'data/raw/gnss/', processed_dir: str = 'data/') -> None:
     # Trajectory GNSS File
     rinexFile = os.path.join(raw_dir, 'all.24O')
-    pickledFile = os.path.join(raw_dir + 'preprocessed_rinex.pkl')
+    shippedPickle = os.path.join(raw_dir, 'preprocessed_rinex.pkl')
     nav_iono = os.path.join(raw_dir, 'LEIJ00DEU_R_20242970000_01D_MN.rnx')
 
     # Warning wrapper until xarray usage in gnss_lib_py is fixed upstream
@@ -161,11 +191,20 @@ def preprocess_gnss(raw_dir: str = 'data/raw/gnss/', processed_dir: str = 'data/
             category=FutureWarning,
             #message=".*use_new_combine_kwarg_defaults.*",
         )
-        # try to load pickled observation file, otherwise load the RINEX file and parse using glp
-        try:
-            rinex_obs = load_rinex(pickledFile)
-        except FileNotFoundError:
-            rinex_obs = load_rinex(rinexFile)
+        # try to load a pickled observation file: the cache of rinexFile if it is newer than rinexFile, then the
+        # one shipped with the raw data, otherwise load the RINEX file, parse using glp and cache the result
+        cacheFile = rinex_cache_path(rinexFile)
+        cacheIsFresh = False
+        if os.path.exists(cacheFile) and os.path.exists(rinexFile):
+            cacheIsFresh = os.path.getmtime(cacheFile) >= os.path.getmtime(rinexFile)
+            if not cacheIsFresh:
+                print(f"Ignoring {cacheFile}, it is older than {rinexFile}.")
+        if cacheIsFresh:
+            rinex_obs = load_rinex(cacheFile)
+        elif os.path.exists(shippedPickle):
+            rinex_obs = load_rinex(shippedPickle)
+        else:
+            rinex_obs = load_rinex(rinexFile, cache_file=cacheFile)
         gnss_data = read_data(rinex_obs, dump_file_dir=raw_dir)
         gnss_data = get_point_ids(gnss_data)
         gnss_data = get_ground_truth(gnss_data)
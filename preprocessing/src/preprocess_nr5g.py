@@ -10,7 +10,7 @@ Naming scheme:
 import numpy as np
 import pandas as pd
 from preprocessing.src.nr5g.loadData import ReadDataset
-from preprocessing.src.utils import add_point_ground_truth, save_df
+from preprocessing.src.utils import add_point_ground_truth, map_list_items, save_df
 
 
 FINAL_COLUMNS = ["point_id", "ts", "anchor_ids", "pos", "SNR", "X_LOCAL_NR5G", "Y_LOCAL_NR5G", "Z_LOCAL_NR5G"]
@@ -41,6 +41,40 @@ A_XY_MRK_TO_LOCAL = np.linalg.inv(A_XY_LOCAL_TO_MRK)
 B_XY_MRK_TO_LOCAL = -A_XY_MRK_TO_LOCAL @ B_XY_LOCAL_TO_MRK
 DZ_MRK_TO_LOCAL = -DZ_LOCAL_TO_MRK
 
+# Contiguous float32 copies of the inverse mapping for add_local_columns_from_mrk(dtype=np.float32)
+A_XY_MRK_TO_LOCAL_F32 = np.ascontiguousarray(A_XY_MRK_TO_LOCAL, dtype=np.float32)
+B_XY_MRK_TO_LOCAL_F32 = np.ascontiguousarray(B_XY_MRK_TO_LOCAL, dtype=np.float32)
+
+# The transformation constants are shared module state, guard them against in-place edits
+for _matrix in (A_XY_LOCAL_TO_MRK, B_XY_LOCAL_TO_MRK, A_XY_MRK_TO_LOCAL, B_XY_MRK_TO_LOCAL,
+                A_XY_MRK_TO_LOCAL_F32, B_XY_MRK_TO_LOCAL_F32):
+    _matrix.setflags(write=False)
+del _matrix
+
+
+def _affine_xyz(xyz: np.ndarray, a_xy: np.ndarray, b_xy: np.ndarray, dz: float, name: str) -> np.ndarray:
+    """Apply a 2D affine in x-y plus a z-offset and round to mm, in a single N x 3 pass.
+
+    Accepts shape (3,), (N, 3). Returns same shape.
+    """
+    if isinstance(xyz, np.ndarray) and xyz.dtype == np.float64 and xyz.flags.c_contiguous:
+        x = xyz
+    else:
+        x = np.asarray(xyz, dtype=float)
+
+    single = x.shape == (3,)
+    if single:
+        x = x.reshape(1, 3)
+    elif x.ndim != 2 or x.shape[1] != 3:
+        raise ValueError(f"{name} must have shape (3,) or (N, 3), got {x.shape}")
+
+    out = np.empty_like(x)
+    np.matmul(x[:, :2], a_xy.T, out=out[:, :2])
+    out[:, :2] += b_xy
+    np.add(x[:, 2], dz, out=out[:, 2])
+    np.round(out, 3, out=out)
+    return out[0] if single else out
+
 
 def local_to_mrk(xyz_local: np.ndarray) -> np.ndarray:
     """Transform LOCAL (X,Y,Z) to MRK (X,Y,Z) using 2D affine + z-offset.
@@ -48,44 +82,13 @@ def local_to_mrk(xyz_local: np.ndarray) -> np.ndarray:
     Accepts shape (3,), (N, 3).
     Returns same shape.
     """
-    x = np.asarray(xyz_local, dtype=float)
-
-    if x.shape == (3,):
-        xy_mrk = A_XY_LOCAL_TO_MRK @ x[:2] + B_XY_LOCAL_TO_MRK
-        z_mrk = x[2] + DZ_LOCAL_TO_MRK
-        xy_mrk = np.round(xy_mrk, 3)
-        z_mrk = np.round(z_mrk, 3)
-        return np.array([xy_mrk[0], xy_mrk[1], z_mrk], dtype=float)
-
-    if x.ndim == 2 and x.shape[1] == 3:
-        xy_mrk = (x[:, :2] @ A_XY_LOCAL_TO_MRK.T) + B_XY_LOCAL_TO_MRK
-        z_mrk = x[:, 2] + DZ_LOCAL_TO_MRK
-        xy_mrk = np.round(xy_mrk, 3)
-        z_mrk = np.round(z_mrk, 3)
-        return np.column_stack([xy_mrk, z_mrk])
-
-    raise ValueError(f"xyz_local must have shape (3,) or (N, 3), got {x.shape}")
+    return _affine_xyz(xyz_local, A_XY_LOCAL_TO_MRK, B_XY_LOCAL_TO_MRK, DZ_LOCAL_TO_MRK, "xyz_local")
 
 
 def mrk_to_local(xyz_mrk: np.ndarray) -> np.ndarray:
     """Transform MRK (X,Y,Z) to LOCAL (X,Y,Z) using inverse 2D affine + z-offset."""
-    x = np.asarray(xyz_mrk, dtype=float)
+    return _affine_xyz(xyz_mrk, A_XY_MRK_TO_LOCAL, B_XY_MRK_TO_LOCAL, DZ_MRK_TO_LOCAL, "xyz_mrk")
 
-    if x.shape == (3,):
-        xy_local = A_XY_MRK_TO_LOCAL @ x[:2] + B_XY_MRK_TO_LOCAL
-        z_local = x[2] + DZ_MRK_TO_LOCAL
-        xy_local = np.round(xy_local, 3)
-        z_local = np.round(z_local, 3)
-        return np.array([xy_local[0], xy_local[1], z_local], dtype=float)
-
-    if x.ndim == 2 and x.shape[1] == 3:
-        xy_local = (x[:, :2] @ A_XY_MRK_TO_LOCAL.T) + B_XY_MRK_TO_LOCAL
-        z_local = x[:, 2] + DZ_MRK_TO_LOCAL
-        xy_local = np.round(xy_local, 3)
-        z_local = np.round(z_local, 3)
-        return np.column_stack([xy_local, z_local])
-
-    raise ValueError(f"xyz_mrk must have shape (3,) or (N, 3), got {x.shape}")
 
 def add_local_columns_from_mrk(
     df: pd.DataFrame,
@@ -93,6 +96,7 @@ def add_local_columns_from_mrk(
     x_col: str = "X_MRK",
     y_col: str = "Y_MRK",
     out_col: str = "pos",
+    dtype: np.dtype = np.float64,
 ) -> pd.DataFrame:
     """Return a copy with a LOCAL 2D position column computed from MRK X/Y.
 
@@ -103,6 +107,8 @@ def add_local_columns_from_mrk(
         x_col: Column name containing the MRK X coordinate.
         y_col: Column name containing the MRK Y coordinate.
         out_col: Output column name that will contain `[X_LOCAL, Y_LOCAL]` per row.
+        dtype: Computation precision, np.float64 (default) or np.float32. float32 halves
+            the memory traffic but the rounded values carry float32 representation noise.
 
     Returns:
         Copy of `df` with `out_col` added as a list `[x, y]` for each row.
@@ -112,10 +118,19 @@ def add_local_columns_from_mrk(
     if missing:
         raise KeyError(f"Missing columns: {sorted(missing)}")
 
-    xy_mrk = df[[x_col, y_col]].to_numpy(dtype=float)
+    dtype = np.dtype(dtype)
+    if dtype == np.float64:
+        a_xy, b_xy = A_XY_MRK_TO_LOCAL, B_XY_MRK_TO_LOCAL
+    elif dtype == np.float32:
+        a_xy, b_xy = A_XY_MRK_TO_LOCAL_F32, B_XY_MRK_TO_LOCAL_F32
+    else:
+        raise ValueError(f"dtype must be float64 or float32, got {dtype}")
+
+    xy_mrk = df[[x_col, y_col]].to_numpy(dtype=dtype)
     # Convert 2D via the 2D inverse affine mapping.
-    xy_local = (xy_mrk @ A_XY_MRK_TO_LOCAL.T) + B_XY_MRK_TO_LOCAL
-    xy_local = np.round(xy_local, 3)
+    xy_local = xy_mrk @ a_xy.T
+    xy_local += b_xy
+    np.round(xy_local, 3, out=xy_local)
 
     out = df.copy()
     out[out_col] = xy_local.tolist()
@@ -151,7 +166,7 @@ def preprocess_nr5g(
     df.dropna(subset=["anchor_ids"], inplace=True)
 
     # Rename column anchor_ids using RENAME_RADIO_UNIT
-    df['anchor_ids'] = df['anchor_ids'].apply(lambda anchors: [RENAME_RADIO_UNIT.get(anchor, anchor) for anchor in anchors])
+    df['anchor_ids'] = map_list_items(df['anchor_ids'], RENAME_RADIO_UNIT)
 
     # Sort by timestamp
     df.sort_values(by='ts', inplace=True)
@@ -1,10 +1,11 @@
 import os
+import numpy as np
 import pandas as pd
 from typing import Optional
 
 from preprocessing.src.uwb.loadData import ReadDataset
 from preprocessing.src.uwb.reorderAnchors import AnchorReorderer
-from preprocessing.src.utils import add_point_ground_truth, save_df
+from preprocessing.src.utils import add_point_ground_truth, map_list_items, save_df
 
 # Constants
 DEFAULT_INPUT_DIR = 'data/raw/uwb'
@@ -48,8 +49,16 @@ def preprocess_uwb(
     # Process data
     df = add_point_ground_truth(df)
 
-    # Filter out rows where all range values are NaN
-    df = df[df['ranges'].apply(lambda x: not all(pd.isna(x)))]
+    # Filter out rows where all range values are NaN: one isnan over the flattened ranges, reduced per row
+    ranges = df['ranges'].to_numpy()
+    lengths = np.fromiter(map(len, ranges), dtype=np.int64, count=len(ranges))
+    all_nan = np.ones(len(ranges), dtype=bool)  # rows without ranges count as all NaN, like all([])
+    non_empty = lengths > 0
+    if non_empty.any():
+        is_nan = np.isnan(np.concatenate(ranges[non_empty]).astype(float))
+        starts = np.concatenate(([0], np.cumsum(lengths[non_empty])[:-1]))
+        all_nan[non_empty] = np.logical_and.reduceat(is_nan, starts)
+    df = df[~all_nan]
 
     # Reorder anchors
     anchor_reorderer = AnchorReorderer(df)
@@ -69,7 +78,7 @@ def preprocess_uwb(
 
 
     # Replace anchor_ids based on anchor_mapping
-    df['anchor_ids'] = df['anchor_ids'].apply(lambda ids: [anchor_mapping.get(id, id) for id in ids])
+    df['anchor_ids'] = map_list_items(df['anchor_ids'], anchor_mapping)
 
     save_df(df, "uwb")
 
@@ -1,5 +1,4 @@
 import pandas as pd
-import math
 import numpy as np
 from preprocessing.src.utils import add_point_ground_truth, save_df
 
@@ -23,8 +22,8 @@ def preprocess_wifi(input_file: str = 'data/raw/wifi/ranges_combined.csv') -> No
         output_dir: Directory where the processed data will be saved
     """
 
-    # Load and rename timestamp column
-    df = pd.read_csv(input_file)
+    # Load with the multi-threaded pyarrow parser and rename timestamp column
+    df = pd.read_csv(input_file, engine='pyarrow')
     df.rename(columns={'Unix_Timestamp': 'ts'}, inplace=True)
 
     # Add ground truth information
@@ -34,9 +33,12 @@ def preprocess_wifi(input_file: str = 'data/raw/wifi/ranges_combined.csv') -> No
     df.drop_duplicates(AP_COLUMNS, inplace=True)
 
     # Convert individual AP columns to lists and handle infinity values
-    df['ranges'] = df[AP_COLUMNS].values.tolist()
-    df['ranges'] = df['ranges'].apply(lambda row: [r if r != math.inf else np.nan for r in row])
-    df['anchor_ids'] = [AP_COLUMNS] * len(df)
+    ranges = df[AP_COLUMNS].to_numpy(dtype=float)
+    ranges[ranges == np.inf] = np.nan
+    df['ranges'] = ranges.tolist()
+    # Anchor ids are the same for every row, so map them once
+    anchor_ids = [AP_MAPPING.get(ap, ap) for ap in AP_COLUMNS]
+    df['anchor_ids'] = [anchor_ids.copy() for _ in range(len(df))]
 
     # Remove the individual AP columns as they're now in the ranges list
     df.drop(AP_COLUMNS, inplace=True, axis=1)
@@ -50,8 +52,6 @@ def preprocess_wifi(input_file: str = 'data/raw/wifi/ranges_combined.csv') -> No
     # Select and order final columns
     df = df[FINAL_COLUMNS]
 
-    df['anchor_ids'] = df['anchor_ids'].apply(lambda ids: [AP_MAPPING.get(id, id) for id in ids])
-
     # Save the processed data
     save_df(df, "wifi")
 
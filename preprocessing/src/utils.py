@@ -1,3 +1,8 @@
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+
+import numpy as np
 import pandas as pd
 
 point_mapping = {
@@ -51,6 +56,69 @@ point_mapping = {
     "T06": "T06"
 }
 
+@functools.lru_cache(maxsize=None)
+def _read_reference(name: str) -> pd.DataFrame:
+    return pd.read_pickle(f"data/reference/pickle/{name}.pkl")
+
+
+def load_reference(name: str) -> pd.DataFrame:
+    """
+    Load a reference table (e.g. "point_coordinates", "time_reference") from data/reference/pickle.
+
+    The file is read once per name and cached, repeated calls within one process don't hit the disk again.
+    Every call returns its own copy of the (small) table, so callers may modify it.
+
+    :param name: File name of the reference table without extension.
+    :return: The reference table.
+    """
+    return _read_reference(name).copy()
+
+
+def map_list_items(lists: pd.Series, mapping: dict) -> list:
+    """
+    Maps every item of a list-valued column through `mapping`, items without a mapping are kept.
+
+    Rows usually share a handful of distinct lists (e.g. anchor ids), so each distinct list is
+    mapped once and every row receives its own copy of the mapped list.
+
+    :param lists: Series holding one list per row.
+    :param mapping: Item mapping.
+    :return: List with one mapped list per row, in the order of `lists`.
+    """
+    codes, uniques = pd.factorize(lists.map(tuple))
+    mapped = [[mapping.get(item, item) for item in items] for items in uniques]
+    return [mapped[code].copy() for code in codes]
+
+
+def lookup_point_ids(times: pd.Series, windows: pd.DataFrame, start_col: str, end_col: str) -> np.ndarray:
+    """
+    Looks up the point whose time window [start, end] contains each timestamp.
+
+    The windows don't overlap, so a backward as-of join on the window start followed by a check
+    against the window end finds the containing window for all timestamps in one sorted pass.
+
+    :param times: Timestamps (datetime64) to look up.
+    :param windows: Reference table with the window bounds and a "point" column.
+    :param start_col: Column holding the window start times.
+    :param end_col: Column holding the window end times.
+    :return: Object array with the point per timestamp, None outside every window.
+    """
+    times = pd.Series(pd.to_datetime(times).to_numpy())
+    valid = times.notna().to_numpy()
+    order = np.flatnonzero(valid)[np.argsort(times.to_numpy()[valid], kind="stable")]
+
+    matched = pd.merge_asof(
+        pd.DataFrame({"time": times.to_numpy()[order]}),
+        windows[[start_col, end_col, "point"]].sort_values(start_col),
+        left_on="time", right_on=start_col, direction="backward",
+    )
+    in_window = (matched["time"] <= matched[end_col]).to_numpy()
+
+    point_id = np.full(len(times), None, dtype=object)
+    point_id[order[in_window]] = matched["point"].to_numpy()[in_window]
+    return point_id
+
+
 def rename_points(df, point_column_name='point_id') -> pd.DataFrame:
     """
     Rename points in the DataFrame based on a predefined mapping.
@@ -60,13 +128,17 @@ def rename_points(df, point_column_name='point_id') -> pd.DataFrame:
     :return: DataFrame with renamed points.
     """
     if point_column_name in df.columns:
-        df[point_column_name] = df[point_column_name].replace(point_mapping)
-        # remove points that are not in the mapping
-        points_to_drop = set(df[point_column_name]) - set(point_mapping.values())
-        if points_to_drop:
-            print(f"Dropping points not in mapping: {points_to_drop}")
-        # Filter the DataFrame to keep only rows with points in the mapping
-        df = df[df[point_column_name].isin(point_mapping.values())]
+        # Single lookup pass: already renamed points map to themselves,
+        # points that are not in the mapping become NaN
+        lookup = {name: name for name in point_mapping.values()}
+        lookup.update(point_mapping)
+        mapped = df[point_column_name].map(lookup)
+        unknown = mapped.isna()
+        if unknown.any():
+            print(f"Dropping points not in mapping: {set(df.loc[unknown, point_column_name])}")
+        # Keep only rows with points in the mapping
+        df = df[~unknown].copy()
+        df[point_column_name] = mapped[~unknown]
     else:
         raise ValueError(f"Column '{point_column_name}' not found in DataFrame.")
 
@@ -101,9 +173,9 @@ def get_ground_truth(df: pd.DataFrame) -> pd.DataFrame:
         the ground truth dataset.
     :rtype: pd.DataFrame
     """
-    ground_truth = pd.read_pickle("data/reference/pickle/point_coordinates.pkl")
-    df = df.merge(ground_truth, on="point_id", how="outer")
-    df.sort_values(by="ts", inplace=True)
+    ground_truth = load_reference("point_coordinates")
+    df = df.merge(ground_truth, on="point_id", how="left")
+    df.sort_values(by="ts", kind="stable", inplace=True)
     return df
 
 def get_pointid_from_timestamp(df: pd.DataFrame) -> pd.DataFrame:
@@ -120,20 +192,40 @@ def get_pointid_from_timestamp(df: pd.DataFrame) -> pd.DataFrame:
         defined time window are removed.
     :rtype: pd.DataFrame
     """
-    measurement_time = pd.read_pickle("data/reference/pickle/time_reference.pkl")
-    df["local_time"] = pd.to_datetime(df["ts"].astype(float), unit="ms") + pd.Timedelta(hours=2)
-    for idx, row in measurement_time.iterrows():
-        # Determine which rows fall into the current time window
-        in_window = (df["local_time"] >= row["start_time_local"]) & (
-                df["local_time"] <= row["end_time_local"]
-        )
-        df.loc[in_window, "point_id"] = row["point"]
+    measurement_time = load_reference("time_reference")
+    local_time = pd.to_datetime(df["ts"].astype(float), unit="ms") + pd.Timedelta(hours=2)
+
+    # Find the window containing each timestamp with one as-of join instead of a mask per window
+    point_id = lookup_point_ids(local_time, measurement_time, "start_time_local", "end_time_local")
+    in_window = pd.notna(point_id)
+    df.loc[in_window, "point_id"] = point_id[in_window]
 
-    df.drop(columns=["local_time"], inplace=True)
     df.dropna(subset=["point_id"], inplace=True)
     return df
 
-def save_df(df: pd.DataFrame, system_str: str) -> None:
-    df.to_csv(f"data/processed/csv/{system_str}.csv", index=False, encoding="utf-8")
-    df.to_pickle(f"data/processed/pickle/{system_str}.pkl")
-    df.to_parquet(f"data/processed/parquet/{system_str}.parquet")
+def save_df(df: pd.DataFrame, system_str: str, formats: Iterable[str] = ("csv", "pickle", "parquet")) -> None:
+    """
+    Saves the processed DataFrame of a system to data/processed/<format>/.
+
+    The writers are independent and IO bound, so the requested formats are written concurrently.
+
+    :param df: Processed DataFrame.
+    :param system_str: System name used as file name, e.g. "wifi".
+    :param formats: Any of "csv", "pickle" and "parquet". Defaults to all three.
+    """
+    writers = {
+        "csv": lambda: df.to_csv(f"data/processed/csv/{system_str}.csv", index=False, encoding="utf-8",
+                                 lineterminator="\n"),
+        "pickle": lambda: df.to_pickle(f"data/processed/pickle/{system_str}.pkl"),
+        # Repetitive columns such as point_id are dictionary-encoded by pyarrow, the frame keeps its dtypes
+        "parquet": lambda: df.to_parquet(f"data/processed/parquet/{system_str}.parquet", engine="pyarrow",
+                                         compression="zstd", use_dictionary=True),
+    }
+    unknown = set(formats) - set(writers)
+    if unknown:
+        raise ValueError(f"Unknown output formats: {sorted(unknown)}")
+
+    with ThreadPoolExecutor(max_workers=len(writers)) as executor:
+        futures = [executor.submit(writers[fmt]) for fmt in formats]
+        for future in futures:
+            future.result()
@@ -11,29 +11,52 @@ import json
 import glob
 import numpy as np
 
+try:
+    import orjson  # type: ignore
+except ImportError:
+    # orjson is optional; the standard library parser is used instead
+    orjson = None
+
+# Both parsers accept the raw BLOB bytes directly
+_loads = orjson.loads if orjson is not None else json.loads
+
+# Rows fetched from SQLite per chunk
+CHUNK_SIZE = 50_000
+
+
+def _decode_messages(messages):
+    """Decode the JSON payloads of one chunk, traversing each message once."""
+    n = len(messages)
+    ts_list, anchor_list, tag_list, range_list = [None] * n, [None] * n, [None] * n, [None] * n
+    for i, raw in enumerate(messages):
+        msg = _loads(raw)
+        ts_list[i] = int(msg[0]['timestamp'])
+        tag_list[i] = msg[0]['addressA']
+        anchor_list[i] = [hex(int(item['addressB']))[-2:].upper() for item in msg]
+        ranges = np.array([item['value'] for item in msg], dtype=float)
+        range_list[i] = np.where(ranges > 0.0, ranges, np.nan).tolist()
+
+    return pd.DataFrame({
+        'ts': np.asarray(ts_list, dtype=np.int64),
+        'anchor_ids': anchor_list,
+        'tag_id': tag_list,
+        'ranges': range_list,
+    })
+
+
 class ReadDataset:
     def __init__(self, path):
         self.path = path
 
     def load_data(self):
-        zigposFiles = glob.glob(self.path, recursive=True)
-        df = pd.DataFrame()
+        zigposFiles = glob.iglob(self.path, recursive=True)
+        parts = []
 
-        for index, zigposFile in enumerate(zigposFiles):
+        for zigposFile in zigposFiles:
             with sqlite3.connect(zigposFile) as con:
-                logData = pd.read_sql_query("SELECT * FROM LOG", con)
-                logData['MESSAGE'] = logData.apply(lambda row: json.loads(row['MESSAGE'].decode('utf-8')), axis=1)
-                
-                tempDf = pd.DataFrame({
-                    'ts': logData.apply(lambda row: row['MESSAGE'][0]['timestamp'], axis=1),
-                    'anchor_ids': logData.apply(lambda row: [hex(int(item['addressB']))[-2:].upper() for item in row['MESSAGE']], axis=1),
-                    'tag_id': logData.apply(lambda row: row['MESSAGE'][0]['addressA'], axis=1),
-                    'ranges': logData.apply(lambda row: [item['value'] for item in row['MESSAGE']], axis=1),
-                })
-
-                tempDf['ranges'] = tempDf['ranges'].apply(lambda row: [r if r > 0.0 else np.nan for r in row])
-                tempDf['ts'] = tempDf['ts'].apply(lambda x: int(x))
-                df = pd.concat([df, tempDf])
-
-        df.reset_index(drop=True, inplace=True)
+                # Only the payload is needed; stream it so large captures are never fully materialized
+                for logData in pd.read_sql_query("SELECT MESSAGE FROM LOG", con, chunksize=CHUNK_SIZE):
+                    parts.append(_decode_messages(logData['MESSAGE'].to_numpy()))
+
+        df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
         return df
@@ -5,6 +5,10 @@ Created on Thu Nov 14 14:52:58 2024
 @author: M.Ammad
 """
 
+import numpy as np
+import pandas as pd
+
+
 class AnchorReorderer:
     anchor_ids_order = ['9A', 'AB', '97', '98', '94', '89', '92', '9B', '95', '9C']
 
@@ -38,8 +42,29 @@ class AnchorReorderer:
         Returns:
         - DataFrame: Updated DataFrame with reordered anchor_ids and ranges columns.
         """
-        self.df[['anchor_ids', 'ranges']] = self.df.apply(
-            lambda row: self.reorder_anchors(row['anchor_ids'], row['ranges']),
-            axis=1, result_type='expand'
-        )
+        if self.df.empty:
+            return self.df
+
+        rank = {anchor: i for i, anchor in enumerate(self.anchor_ids_order)}
+        n_rows = len(self.df)
+        lengths = self.df['anchor_ids'].map(len).to_numpy()
+
+        # Flatten all (row, anchor, range) entries and rank the anchors in one lookup
+        anchor_ids = pd.Series(np.concatenate([np.asarray(a, dtype=object) for a in self.df['anchor_ids']]))
+        flat = pd.DataFrame({
+            'row': np.repeat(np.arange(n_rows), lengths),
+            'rank': anchor_ids.map(rank).to_numpy(),
+            'range': np.concatenate([np.asarray(r, dtype=float) for r in self.df['ranges']]),
+        })
+        # Unknown anchors are dropped, for repeated anchors the last range wins (as in reorder_anchors)
+        flat = flat[flat['rank'].notna()].drop_duplicates(['row', 'rank'], keep='last')
+        flat = flat.sort_values(['row', 'rank'], kind='stable')
+
+        order = np.asarray(self.anchor_ids_order, dtype=object)
+        splits = np.cumsum(np.bincount(flat['row'].to_numpy(), minlength=n_rows))[:-1]
+        anchors = np.split(order[flat['rank'].to_numpy(dtype=np.int64)], splits)
+        ranges = np.split(flat['range'].to_numpy(), splits)
+
+        self.df['anchor_ids'] = [a.tolist() for a in anchors]
+        self.df['ranges'] = [r.tolist() for r in ranges]
         return self.df